@@ -2,16 +2,27 @@ import sys
 sys.path.append(".")
 
 import argparse
+import atexit
 import json
 
-from unified_planning.engines import PlanGenerationResultStatus
 from unified_planning.environment import get_environment
-from flask import Flask, request
-from unified_planning.shortcuts import Not, And, OneshotPlanner
+from unified_planning.shortcuts import And
+from flask import Flask, request, Response
+from werkzeug.serving import make_server
 
 from AIROB.domain import PDDLEnvironment, get_type_predicates, get_type_predicate_descriptors, get_type_predicate_args
+from AIROB.domain.PDDLJobs import PDDLJobManager
+from AIROB.domain.PDDLDecomposition import PDDLDecomposition, partition
+from AIROB.domain.PDDLPlanCache import PDDLPlanCache
+from AIROB.domain.PDDLRepair import repair
+from AIROB.domain.PDDLMetrics import PDDLMetrics
 
 app = Flask(__name__)
+app.config["AIROB_DEBUG"] = False
+app.config["AIROB_PRUNE"] = False
+app.config["AIROB_DECOMPOSE"] = False
+
+STEP_FIELDS = ("action", "params")
 
 
 @app.route("/api/objects")
@@ -34,64 +45,381 @@ def predicates_params(typ, pred):
         return {}, 404
     typ = PDDLEnvironment.get_instance().types[typ]
     params = get_type_predicate_args(typ.cls, pred, PDDLEnvironment.get_instance())
+    if params is None:
+        return {}, 404
+    params = dict(params)
     for k, v in params.items():
         params[k] = PDDLEnvironment.get_instance().get_objects_hierarchy(v)
     return params
 
 
+def serialize_plan(writer, plan):
+    # planner output uses the names of the PDDL text
+    return serialize_steps((writer.get_item_named(name).name, [writer.get_item_named(p).name for p in params])
+                           for name, params in plan)
+
+
+def serialize_steps(steps):
+    with PDDLMetrics.get_instance().timed("serialize"):
+        return PDDLEnvironment.get_instance().serialize_steps(steps)
+
+
+def plan_response(ret, code=200):
+    # clients accepting NDJSON get the job without its plan on the first line and then one step per line
+    if ret.get("plan") is None or \
+            request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) != "application/x-ndjson":
+        return ret, code
+    plan = ret.pop("plan")
+
+    def lines():
+        yield json.dumps(ret | {"steps": len(plan)}) + "\n"
+        for step in plan:
+            yield json.dumps(step) + "\n"
+
+    return Response(lines(), status=code, mimetype="application/x-ndjson")
+
+
+def parse_goals(goals):
+    # returns the goal expressions and the errors of the invalid atoms
+    with PDDLMetrics.get_instance().timed("goal"):
+        return PDDLEnvironment.get_instance().goals.compile(goals)
+
+
+def parse_body(fields=None):
+    # returns the JSON body and the errors, fields are required when the body is an object
+    try:
+        data = json.loads(request.data.decode())
+    except ValueError:
+        return None, [{"error": "body is not JSON"}]
+    if fields is None:
+        return data, []
+    if not isinstance(data, dict) or any(k not in data for k in fields):
+        return None, [{"error": "missing fields", "fields": [k for k in fields if not isinstance(data, dict) or k not in data]}]
+    return data, []
+
+
+def field_errors(field, errors):
+    # the indices of the errors refer to the list in the given field of the body
+    return [{"field": field} | error for error in errors]
+
+
+def plan_steps(actions):
+    # returns the (action, params) steps and the errors of the invalid ones, like parse_goals
+    if not isinstance(actions, list):
+        return None, [{"error": "plan is not a list of steps"}]
+    executors = PDDLEnvironment.get_instance().executors
+    errors = []
+    for i, a in enumerate(actions):
+        if not isinstance(a, dict) or any(k not in a for k in STEP_FIELDS):
+            errors.append({"index": i, "error": "missing fields",
+                           "fields": [k for k in STEP_FIELDS if not isinstance(a, dict) or k not in a]})
+        elif not isinstance(a["action"], str) or a["action"] not in executors:
+            errors.append({"index": i, "error": "unknown action", "action": a["action"]})
+        elif not isinstance(a["params"], list) or executors[a["action"]].bind(a["params"]) is None:
+            errors.append({"index": i, "error": "wrong parameters", "action": a["action"],
+                           "expected": list(executors[a["action"]].type_names)})
+    if len(errors) > 0:
+        return None, errors
+    return [(a["action"], a["params"]) for a in actions], []
+
+
+def flag(value):
+    return value not in ("0", "false")
+
+
 @app.route("/api/plan", methods=["POST"])
 def plan():
-    prob = PDDLEnvironment.get_instance().problem("problem")
-
-    goal_predicates = []
-    for p in json.loads(request.data.decode()):
-        obj = PDDLEnvironment.get_instance().get_object_by_id(p['object'])
-        predicate_fn = getattr(obj, p['predicate'])
-        raw = predicate_fn(**{k: PDDLEnvironment.get_instance().get_object_by_id(v) for k, v in p['params'].items()})
-        goal_predicates.append(
-            raw if p['value'] else Not(raw)
-        )
-
-    prob.add_goal(And(*goal_predicates))
-    print(prob)
-    actions = []
-    with OneshotPlanner(problem_kind=prob.kind, name='fast-downward') as planner:
-        result = planner.solve(prob)
-        if result.status == PlanGenerationResultStatus.SOLVED_SATISFICING:
-            print("plan returned: %s" % result.plan)
-            for action in result.plan.actions:
-                actions.append({
-                    "action": action.action.name,
-                    "params": list(map(lambda x: str(x), action.actual_parameters)),
-                    "user": action.action.name in PDDLEnvironment.get_instance().user_actions,
-                    "user_message": PDDLEnvironment.get_instance().user_message(action)
-                })
-        else:
-            print("No plan found.")
-
-    return actions
+    goals, errors = parse_body()
+    if len(errors) > 0:
+        return {"errors": errors}, 400
+    goal_predicates, errors = parse_goals(goals)
+    if len(errors) > 0:
+        return {"errors": errors}, 400
+    return plan_response(*solve(goals, goal_predicates))
+
+
+@app.route("/api/replan", methods=["POST"])
+def replan():
+    data, errors = parse_body(("goal", "plan"))
+    if len(errors) > 0:
+        return {"errors": errors}, 400
+    env = PDDLEnvironment.get_instance()
+    goal_predicates, errors = parse_goals(data["goal"])
+    steps, step_errors = plan_steps(data["plan"])
+    if len(errors) + len(step_errors) > 0:
+        return {"errors": field_errors("goal", errors) + field_errors("plan", step_errors)}, 400
+    with PDDLMetrics.get_instance().timed("repair"):
+        result = repair(env, steps, goal_predicates,
+                        request.args.get("depth", 3, type=int), request.args.get("nodes", 500, type=int))
+    if result is None:
+        PDDLMetrics.get_instance().inc("plan_repairs", kind="planned")
+        ret, code = solve(data["goal"], goal_predicates)
+        return plan_response(ret | {"repair": "planned"}, code)
+    PDDLMetrics.get_instance().inc("plan_repairs", kind=result.kind)
+    actions = serialize_steps(result.steps)
+    env.plans.put(env.state.fingerprint(), PDDLPlanCache.goal_key(data["goal"]), actions)
+    return plan_response(PDDLJobManager.get_instance().completed(actions).to_dict() | {"repair": result.kind})
+
+
+def solve(goals, goal_predicates):
+    PDDLEnvironment.get_instance().update_state()
+    key = (PDDLEnvironment.get_instance().state.fingerprint(), PDDLPlanCache.goal_key(goals))
+    cached = PDDLEnvironment.get_instance().plans.get(*key)
+    if cached is not None:
+        steps, _ = plan_steps(cached)
+        if steps is not None and PDDLEnvironment.get_instance().simulate(steps, goal_predicates).goal:
+            PDDLMetrics.get_instance().inc("plan_cache_hits")
+            return PDDLJobManager.get_instance().completed(cached).to_dict(), 200
+        PDDLMetrics.get_instance().inc("plan_cache_invalid")
+        PDDLEnvironment.get_instance().plans.discard(*key)
+    PDDLMetrics.get_instance().inc("plan_cache_misses")
+    if And(*goal_predicates).simplify().is_false():
+        # a goal on an inlined static predicate that does not hold, there is nothing to render
+        return PDDLJobManager.get_instance().completed(None, "unsolvable").to_dict(), 200
+
+    def done(result):
+        if app.config["AIROB_DEBUG"]:
+            print("plan returned: %s" % result)
+        actions = serialize_plan(writer, result)
+        PDDLEnvironment.get_instance().plans.put(*key, actions)
+        return actions
+
+    env = PDDLEnvironment.get_instance()
+    prune = request.args.get("prune", app.config["AIROB_PRUNE"], type=flag)
+    domain, problem, writer = env.pddl(goal_predicates)
+    if request.args.get("decompose", app.config["AIROB_DECOMPOSE"], type=flag):
+        with PDDLMetrics.get_instance().timed("partition"):
+            groups = partition(env, goal_predicates, PDDLJobManager.get_instance().size - 1)
+        if len(groups.groups) > 1:
+            return PDDLDecomposition(env, PDDLJobManager.get_instance(), goal_predicates, groups, prune, done).job.to_dict(), 202
+
+    fallback = None
+    if prune:
+        with PDDLMetrics.get_instance().timed("relevance"):
+            pruned = env.prune(goal_predicates)
+        fallback = problem
+        _, problem, _ = env.pddl(pruned.goals, objects=pruned.objects)
+    if app.config["AIROB_DEBUG"]:
+        print(domain)
+        print(problem)
+
+    job = PDDLJobManager.get_instance().submit(domain, problem, done, fallback=fallback)
+    return job.to_dict(), 202
+
+
+@app.route("/api/simulate", methods=["POST"])
+def simulate():
+    data, errors = parse_body(("plan",))
+    if len(errors) > 0:
+        return {"errors": errors}, 400
+    env = PDDLEnvironment.get_instance()
+    goals, errors = parse_goals(data["goal"]) if "goal" in data else (None, [])
+    steps, step_errors = plan_steps(data["plan"])
+    if len(errors) + len(step_errors) > 0:
+        return {"errors": field_errors("goal", errors) + field_errors("plan", step_errors)}, 400
+    with env.reading():
+        result = env.simulate(steps, goals)
+        return {
+            "version": env.state.version,
+            "applicable": result.step is None,
+            "step": result.step,
+            "goal": result.goal,
+            "changes": env.state.atoms(env.state.diff(env.state.values, result.values), result.values),
+        }
+
+
+@app.route("/api/plan/<id>")
+def plan_job(id):
+    job = PDDLJobManager.get_instance().get(id)
+    if job is None:
+        return {}, 404
+    return plan_response(job.to_dict())
+
+
+@app.route("/api/plan/<id>", methods=["DELETE"])
+def cancel_plan_job(id):
+    job = PDDLJobManager.get_instance().cancel(id)
+    if job is None:
+        return {}, 404
+    return job.to_dict()
+
+
+@app.route("/api/planner")
+def planner_stats():
+    return PDDLJobManager.get_instance().stats() | {"cache": PDDLEnvironment.get_instance().plans.stats()}
+
+
+@app.route("/api/metrics")
+def metrics():
+    return Response(PDDLMetrics.get_instance().render(), mimetype="text/plain; version=0.0.4")
+
+
+def collect_metrics():
+    jobs = PDDLJobManager.get_instance().stats()
+    cache = PDDLEnvironment.get_instance().plans.stats()
+    goals = PDDLEnvironment.get_instance().goals.stats()
+    return {
+        "planner_workers": jobs["size"],
+        "planner_busy": jobs["busy"],
+        "planner_queue": jobs["waiting"],
+        "planner_jobs": jobs["jobs"],
+        "planner_engine_wins": {(("engine", k),): v["wins"] for k, v in jobs["engines"].items()},
+        "planner_engine_runs": {(("engine", k),): v["runs"] for k, v in jobs["engines"].items()},
+        "plan_cache_size": cache["size"],
+        "goal_cache_size": goals["size"],
+        "goal_cache_hits": goals["hits"],
+        "goal_cache_misses": goals["misses"],
+        "state_atoms": len(PDDLEnvironment.get_instance().state),
+        "state_version": PDDLEnvironment.get_instance().state.version,
+    }
+
+
+@app.after_request
+def count_request(response):
+    PDDLMetrics.get_instance().inc("http_requests", endpoint=request.endpoint, status=response.status_code)
+    return response
 
 
 @app.route("/api/execute/<action>", methods=["POST"])
 def execute(action):
-    params = json.loads(request.data.decode())
-    PDDLEnvironment.get_instance().execute_action_raw(action, params)
+    env = PDDLEnvironment.get_instance()
+    params, errors = parse_body()
+    if len(errors) > 0:
+        return {"errors": errors}, 400
+    if action not in env.executors or env.executors[action].bind(params) is None:
+        return {}, 400
+    if not env.execute_action_raw(action, params, guard=flag(request.args.get("guard", "0"))):
+        return {}, 409
     return {}
 
 
+@app.route("/api/execute", methods=["POST"])
+def execute_batch():
+    actions, errors = parse_body()
+    steps, step_errors = plan_steps(actions) if len(errors) == 0 else (None, [])
+    if len(errors) + len(step_errors) > 0:
+        return {"errors": errors + step_errors}, 400
+    env = PDDLEnvironment.get_instance()
+    with env.lock.write():
+        env.update_state()
+        before = env.state.snapshot()
+        since = env.state.version
+        with PDDLMetrics.get_instance().timed("execute"):
+            steps = env.execute_actions(steps)
+        env.update_state()
+        return {
+            "version": env.state.version,
+            "since": since,
+            "executed": sum(1 for s in steps if s["status"] == "executed"),
+            "steps": steps,
+            "changes": env.state.atoms(env.state.diff(before, env.state.values)),
+        }
+
+
 @app.route("/api/state")
 def get_state():
-    return PDDLEnvironment.get_instance().get_current_state()
+    env = PDDLEnvironment.get_instance()
+    with env.reading():
+        if request.args.get("format") == "binary":
+            return Response(env.state.pack().tobytes(), mimetype="application/octet-stream",
+                            headers={"X-State-Version": str(env.state.version)})
+        return env.get_current_state()
+
+
+@app.route("/api/state/layout")
+def get_state_layout():
+    with PDDLEnvironment.get_instance().reading():
+        return PDDLEnvironment.get_instance().state.layout_dict()
+
+
+@app.route("/api/state/diff")
+def get_state_diff():
+    env = PDDLEnvironment.get_instance()
+    since = request.args.get("since", type=int)
+    with env.reading():
+        changes = env.state.changes(since)
+        if changes is None:
+            return {"version": env.state.version, "error": "unknown version"}, 410
+        return {"version": env.state.version, "since": since, "changes": env.state.atoms(changes)}
+
+
+@app.route("/api/state/stream")
+def stream_state():
+    env = PDDLEnvironment.get_instance()
+    with env.reading():
+        subscription = env.events.subscribe(env.state.version)
+    coalesce = request.args.get("coalesce", 0.05, type=float)
+
+    def event(name, data, version):
+        return f"id: {version}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+
+    def snapshot():
+        state = env.get_current_state()
+        return event("state", state, state["version"])
+
+    def generate():
+        try:
+            yield snapshot()
+            while True:
+                if not env.events.wait(subscription, 15.0, coalesce):
+                    if subscription.closed:
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                # asynchronous changes of the domain objects are evaluated here, only the dirty atoms
+                with env.reading():
+                    since, version, changes, reset = env.events.drain(subscription)
+                    if not reset:
+                        changes = env.state.atoms(changes)
+                if reset:
+                    yield snapshot()
+                elif len(changes) > 0:
+                    yield event("diff", {"version": version, "since": since, "changes": changes}, version)
+        finally:
+            env.events.unsubscribe(subscription)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(prog='AIROB')
     parser.add_argument('-d', '--domain', type=str, required=True, help='Domain package')
+    parser.add_argument('--planner', type=str, default='fast-downward',
+                        help='Planning engine name, a comma separated list runs a parallel portfolio')
+    parser.add_argument('--deadline', type=float, default=None,
+                        help='Seconds a portfolio waits for a shorter plan, by default the first plan wins')
+    parser.add_argument('--planners', type=int, default=1, help='Number of planner worker processes')
+    parser.add_argument('--plan-cache-size', type=int, default=128, help='Number of cached plans')
+    parser.add_argument('--plan-cache-ttl', type=float, default=300.0, help='Seconds a cached plan is kept')
+    parser.add_argument('--pddl-dir', type=str, default=None, help='Directory of the cached domain files')
+    parser.add_argument('--prune', action='store_true',
+                        help='Only send the objects relevant to the goal to the planner, '
+                             'the full problem is solved if the pruned one is unsolvable')
+    parser.add_argument('--decompose', action='store_true',
+                        help='Split independent goals into groups solved in parallel and chained together, '
+                             'racing the whole problem on one more planner worker')
+    parser.add_argument('--debug', action='store_true', help='Dump problems and plans to stdout')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Address the server listens on')
+    parser.add_argument('--port', type=int, default=5000, help='Port the server listens on')
+    parser.add_argument('--serve', action='store_true',
+                        help='Production mode, a multi-threaded server without the debugger and the reloader')
 
     get_environment().credits_stream = None
     args, domain_args = parser.parse_known_args()
     domain = __import__(args.domain)
     domain_parser = domain.args()
     domain_args, _ = domain_parser.parse_known_args(args=domain_args)
+    PDDLEnvironment.get_instance().plans = PDDLPlanCache(args.plan_cache_size, args.plan_cache_ttl)
+    if args.pddl_dir is not None:
+        PDDLEnvironment.get_instance().pddl_dir = args.pddl_dir
     env = domain.create_env(PDDLEnvironment.get_instance(), domain_args)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.config["AIROB_DEBUG"] = args.debug
+    app.config["AIROB_PRUNE"] = args.prune
+    app.config["AIROB_DECOMPOSE"] = args.decompose
+    PDDLMetrics.get_instance().add_collector(collect_metrics)
+    atexit.register(PDDLJobManager.init(args.planner.split(','), args.planners, args.deadline).close)
+    if args.serve:
+        make_server(args.host, args.port, app, threaded=True).serve_forever()
+    else:
+        app.run(debug=True, host=args.host, port=args.port)
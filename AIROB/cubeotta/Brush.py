@@ -27,7 +27,7 @@ class Brush(PDDLObject):
                       And(Not(brush.loaded()),
                           Not(Exists(Brush.loaded(env.var(Brush)), env.var(Brush)))))
     @PDDLEffect(lambda brush: brush.loaded(), True)
-    @PDDLAction(True)
+    @PDDLAction(True, exact=True)
     def load(brush: 'Brush'):
         print(f"Loading brush {brush.idx}")
         brush.loaded = True
@@ -40,7 +40,7 @@ class Brush(PDDLObject):
                                         Not(brush.hasColor()),
                                         Not(brush.picked())))
     @PDDLEffect(lambda brush: brush.loaded(), False)
-    @PDDLAction(True)
+    @PDDLAction(True, exact=True)
     def unload(brush: 'Brush'):
         print(f"Unloading brush {brush.idx}")
         brush.loaded = False
@@ -55,7 +55,7 @@ class Brush(PDDLObject):
                                                Not(color.empty())
                                                ))
     @PDDLEffect(lambda brush: brush.hasColor(), True)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def pickColor(brush: 'Brush', color: 'Color'):
         print(f"Picking color {color.name} with brush {brush.idx}")
         brush.color = color
@@ -66,7 +66,7 @@ class Brush(PDDLObject):
                                         brush.picked()
                                         ))
     @PDDLEffect(lambda brush: brush.hasColor(), False)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def clearBrush(brush: 'Brush'):
         print(f"Clearing brush {brush.idx}")
         brush.color = None
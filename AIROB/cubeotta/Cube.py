@@ -10,7 +10,7 @@ class Cube(PDDLObject):
     def __init__(self, idx):
         super().__init__()
         env = PDDLEnvironment.get_instance()
-        self.sides = [env.add_object(CubeSide(i == 0, i, idx)) for i in range(6)]
+        self.sides = env.add_objects(CubeSide(i == 0, i, idx) for i in range(6))
         self.loaded = False
         self.idx = idx
         self.dry = True
@@ -46,7 +46,7 @@ class Cube(PDDLObject):
                       And(Not(cube.loaded()),
                           Not(Exists(Cube.loaded(env.var(Cube)), env.var(Cube)))))
     @PDDLEffect(lambda cube: cube.loaded(), True)
-    @PDDLAction(True)
+    @PDDLAction(True, exact=True)
     def load(cube: 'Cube'):
         print(f"Loading cube {cube.idx}")
         cube.loaded = True
@@ -58,7 +58,7 @@ class Cube(PDDLObject):
     @PDDLPrecondition(lambda cube, env: And(cube.loaded(),
                                             Forall(CubeSide.dry(env.var(CubeSide)), env.var(CubeSide))))
     @PDDLEffect(lambda cube: cube.loaded(), False)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def unload(cube: 'Cube'):
         print(f"Unloading cube {cube.idx}")
         cube.loaded = False
@@ -74,7 +74,7 @@ class Cube(PDDLObject):
                                                        old_up.dry()))
     @PDDLEffect(lambda old_up: old_up.up(), False)
     @PDDLEffect(lambda new_up: new_up.up(), True)
-    @PDDLAction(True)
+    @PDDLAction(True, exact=True)
     def rotate(cube: 'Cube', old_up: 'CubeSide', new_up: 'CubeSide'):
         print(f"Rotating cube {cube.idx} side {new_up.idx} up")
         old_up.setUp(False)
@@ -54,12 +54,13 @@ class CubeSide(PDDLObject):
     @PDDLEffect(lambda cube, side: side.painted(), True)
     @PDDLEffect(lambda cube, side: side.dry(), False)
     @PDDLEffect(lambda brush: brush.hasColor(), False)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def paint(side: 'CubeSide', cube: 'Cube', brush: 'Brush'):
         print(
             f"Painting side {side.idx} of cube {side.cube} with brush {brush.idx}")  # (Side was {'up' if side.isUp() else 'down'})
         side.painted = True
         side.dry = False
+        brush.setHasColor(False)
 
     @PDDLPrecondition(lambda cube, dryer, side: And(
         side.painted(),
@@ -70,7 +71,7 @@ class CubeSide(PDDLObject):
         cube.cube_has_side(side),
         cube.loaded()))
     @PDDLEffect(lambda cube, side: side.dry(), True)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def drySide(side: 'CubeSide', cube: 'Cube', dryer: 'Dryer'):
         print(f"Drying side {side.idx} of cube {side.cube} using dryer {dryer.idx}")
         side.dry = True
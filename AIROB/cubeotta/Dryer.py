@@ -26,7 +26,7 @@ class Dryer(PDDLObject):
                       And(Not(dryer.loaded()),
                           Not(Exists(Dryer.loaded(env.var(Dryer)), env.var(Dryer)))))
     @PDDLEffect(lambda dryer: dryer.loaded(), True)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def load(dryer: 'Dryer'):
         print(f"Loading dryer {dryer.idx}")
         dryer.loaded = True
@@ -39,7 +39,7 @@ class Dryer(PDDLObject):
                                         Not(dryer.turnedOn()),
                                         Not(dryer.picked())))
     @PDDLEffect(lambda dryer: dryer.loaded(), False)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def unload(dryer: 'Dryer'):
         print(f"Unloading dryer {dryer.idx}")
         dryer.loaded = False
@@ -51,7 +51,7 @@ class Dryer(PDDLObject):
     @PDDLPrecondition(lambda dryer:
                       And(Not(dryer.turnedOn()), dryer.loaded(), dryer.picked()))
     @PDDLEffect(lambda dryer: dryer.turnedOn(), True)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def turnOn(dryer: 'Dryer'):
         print(f"Turning on dryer {dryer.idx}")
         dryer.turnedOn = True
@@ -59,7 +59,7 @@ class Dryer(PDDLObject):
     @PDDLPrecondition(lambda dryer:
                       And(dryer.turnedOn(), dryer.loaded(), dryer.picked()))
     @PDDLEffect(lambda dryer: dryer.turnedOn(), False)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def turnOff(dryer: 'Dryer'):
         print(f"Turning off dryer {dryer.idx}")
         dryer.turnedOn = False
@@ -1,6 +1,6 @@
 # import std_msgs.msg
 from unified_planning.shortcuts import Not, And
-from AIROB.domain import PDDLObject
+from AIROB.domain import PDDLObject, PDDLEnvironment
 from AIROB.domain.decorators import PDDLEffect, PDDLPrecondition, PDDLPredicate, PDDLType, PDDLAction
 # import rospy
 
@@ -18,6 +18,7 @@ class Robot(PDDLObject):
 
     def on_cobotta_free(self, msg):
         self.free = msg
+        PDDLEnvironment.get_instance().mark_dirty(self, Robot.free)
 
     @PDDLPredicate()
     def free(self: 'Robot'):
@@ -30,7 +31,7 @@ class Robot(PDDLObject):
                           robot.free()))
     @PDDLEffect(lambda brush: brush.picked(), True)
     @PDDLEffect(lambda robot: robot.free(), False)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def pickUpBrush(robot: 'Robot', brush: 'Brush'):
         print(f"Picking up brush {brush.idx}")
         brush.setPicked(True)
@@ -44,7 +45,7 @@ class Robot(PDDLObject):
                           robot.free()))
     @PDDLEffect(lambda dryer: dryer.picked(), True)
     @PDDLEffect(lambda robot: robot.free(), False)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def pickUpDryer(robot: 'Robot', dryer: 'Dryer'):
         print(f"Picking up dryer {dryer.idx}")
         dryer.setPicked(True)
@@ -57,7 +58,7 @@ class Robot(PDDLObject):
                           Not(robot.free())))
     @PDDLEffect(lambda brush: brush.picked(), False)
     @PDDLEffect(lambda robot: robot.free(), True)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def putDownBrush(robot: 'Robot', brush: 'Brush'):
         print(f"Putting down brush {brush.idx}")
         brush.setPicked(False)
@@ -71,7 +72,7 @@ class Robot(PDDLObject):
                           Not(robot.free())))
     @PDDLEffect(lambda dryer: dryer.picked(), False)
     @PDDLEffect(lambda robot: robot.free(), True)
-    @PDDLAction()
+    @PDDLAction(exact=True)
     def putDownDryer(robot: 'Robot', dryer: 'Dryer'):
         print(f"Putting down dryer {dryer.idx}")
         dryer.setPicked(False)
@@ -15,15 +15,20 @@ def args():
     return parser
 
 
+def objects(args):
+    # objects are yielded so that the environment registers them in a single bulk pass
+    for i in range(args.cubes):
+        yield Cube(i)
+
+    yield Dryer(0)
+    yield Brush(0)
+    yield Color("red")  # for the time being we assume that we only have one color
+    yield Robot()  # we must have one single instance of Robot
+
+
 def create_env(env: PDDLEnvironment, args):
     # init ros node https://github.com/rospypi/simple
     # rospy.init_node("cobotta")
 
-    for i in range(args.cubes):
-        env.add_object(Cube(i))
-
-    env.add_object(Dryer(0))
-    env.add_object(Brush(0))
-    env.add_object(Color("red"))  # for the time being we assume that we only have one color
-    env.add_object(Robot())  # we must have one single instance of Robot
+    env.add_objects(objects(args))
     return env
@@ -0,0 +1,44 @@
+from importlib.metadata import version, PackageNotFoundError
+
+from unified_planning.engines import PDDLPlanner
+from unified_planning.model import Problem
+from unified_planning.plans import SequentialPlan
+
+# Private unified-planning internals used for speed, only relied on with the versions they were checked against
+# (pinned in requirements.txt). With other versions everything goes through the public API, which is slower:
+# problems are parsed back and solved by the engine, and the whole problem is written once to name the objects.
+TESTED = {"unified-planning": "1.1.0"}
+
+
+def installed(package):
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+
+COMPATIBLE = all(installed(k) == v for k, v in TESTED.items())
+
+
+def direct(engine):
+    # the engine class can be run straight on the PDDL files
+    return COMPATIBLE and issubclass(engine, PDDLPlanner)
+
+
+def command(planner, domain, problem, plan):
+    return planner._get_cmd(domain, problem, plan)
+
+
+def result_status(planner, steps, retval):
+    # engines only check whether there is a plan and the quality metrics of the problem, the steps are kept
+    # with their PDDL names by the caller
+    plan = SequentialPlan([]) if steps is not None else None
+    return planner._result_status(Problem(), plan, retval, [])
+
+
+def namer(writer):
+    # function returning the PDDL name of a type, fluent or object of the writer's problem
+    if COMPATIBLE:
+        return writer._get_mangled_name
+    writer.get_problem()
+    return writer.get_pddl_name
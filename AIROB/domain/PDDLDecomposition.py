@@ -0,0 +1,170 @@
+import threading
+from collections import namedtuple
+from itertools import product
+
+from unified_planning.shortcuts import Not
+
+from .PDDLJobs import PDDLJob
+from .PDDLMetrics import PDDLMetrics
+
+Partition = namedtuple("Partition", ["groups", "objects", "shared"])
+
+
+def partition(env, goals, size=None):
+    # goals sharing objects, apart from the ones every goal needs (robot, tools), are solved together,
+    # the objects every goal needs are returned as shared. Independent groups are merged down to size groups,
+    # more than the planner workers would only wait for each other
+    if len(goals) < 2 or size is not None and size < 2:
+        return Partition([list(goals)], [set()], set())
+    relevant = [set(env.relevant_objects([g])) for g in goals]
+    shared = set.intersection(*relevant)
+    parent = list(range(len(goals)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, objects in enumerate(relevant):
+        for x in objects - shared:
+            if x in owner:
+                parent[find(i)] = find(owner[x])
+            else:
+                owner[x] = i
+    groups, objects = {}, {}
+    for i, g in enumerate(goals):
+        groups.setdefault(find(i), []).append(g)
+        objects.setdefault(find(i), set()).update(relevant[i] - shared)
+    groups, objects = list(groups.values()), list(objects.values())
+    if size is not None and len(groups) > size:
+        # largest groups first, each into the bucket with the fewest goals
+        buckets = [([], set()) for _ in range(size)]
+        for i in sorted(range(len(groups)), key=lambda i: -len(groups[i])):
+            bucket = min(buckets, key=lambda b: len(b[0]))
+            bucket[0].extend(groups[i])
+            bucket[1].update(objects[i])
+        groups, objects = [b[0] for b in buckets], [b[1] for b in buckets]
+    return Partition(groups, objects, shared)
+
+
+def restore(env, goals, objects, shared, values):
+    # literals putting back the atoms through which groups interfere to their values in values: the atoms of the
+    # shared objects, and the atoms of the group's objects read under quantifiers by any action (only one cube
+    # loaded at a time), unless the group's goals set them
+    with env.reading():
+        relevance = env.relevance()
+        mentioned = {g.arg(0) if g.is_not() else g for g in goals}
+        changed = {k for k, _ in relevance.achievers}
+        ret = []
+        for k, (_, _, types, _) in env.state.layout.items():
+            if k not in changed:
+                continue
+            allowed = objects | shared if k in relevance.quantified else shared
+            for ids in product(*([x for x in env.state.hierarchy.get(t, ()) if x in allowed] for t in types)):
+                node = env.predicates_compiled[k](*map(env.get_object_by_id, ids))
+                if node not in mentioned:
+                    ret.append(node if values[env.state.index((k, ids))] else Not(node))
+        return ret
+
+
+class PDDLDecomposition:
+    # solves goal groups in parallel and stitches the sub-plans in sequence, re-solving a group
+    # from the simulated state when its sub-plan does not apply after the previous ones.
+    # Every group but the last also has to put the shared objects (robot, tools) and the quantified atoms of
+    # its objects back as they were, so that the sub-plans, all computed from the same state, compose.
+    # Putting them back can be much harder than the group or impossible (a side left wet blocks every unload),
+    # so the whole problem races the groups on one more worker and whichever plan comes first wins
+
+    def __init__(self, env, manager, goals, partition, prune=False, callback=None):
+        self.env = env
+        self.manager = manager
+        self.goals = goals
+        self.prune = prune
+        self.values = env.state.snapshot()
+        last = len(partition.groups) - 1
+        self.groups = [group + (restore(env, group, objects, partition.shared, self.values) if i < last else [])
+                       for i, (group, objects) in enumerate(zip(partition.groups, partition.objects))]
+        self.job = manager.track(PDDLJob(None, None, callback=callback))
+        self.__lock = threading.Lock()
+        threading.Thread(target=self.__run, daemon=True).start()
+
+    def __submit(self, goals, values):
+        domain, problem, writer = self.env.pddl(goals, values=values)
+        fallback = None
+        if self.prune:
+            fallback = problem
+            pruned = self.env.prune(goals, values)
+            _, problem, _ = self.env.pddl(pruned.goals, objects=pruned.objects, values=values)
+        job = self.manager.submit(domain, problem, fallback=fallback)
+        self.job.children.append(job)
+        return job, writer
+
+    def __wait(self, job):
+        job.wait()
+        if self.job.closed:
+            raise InterruptedError()
+        return job
+
+    def __finish(self, status, plan):
+        with self.__lock:
+            if self.job.closed:
+                return
+            self.job.closed = True
+        self.job.finish(status, plan)
+        for child in self.job.children:
+            self.manager.cancel(child.id)
+
+    def __apply(self, writer, values, steps):
+        steps = [(writer.get_item_named(name).name, [writer.get_item_named(p).name for p in params])
+                 for name, params in steps]
+        result = self.env.simulate(steps, values=values)
+        return result.values if result.step is None else None
+
+    def __stitch(self, children):
+        plan, values = [], self.values
+        for group, (child, writer) in zip(self.groups, children):
+            child = self.__wait(child)
+            applied = None
+            if child.status == "solved":
+                applied = self.__apply(writer, values, child.plan)
+            if applied is None:
+                # the sub-plan was computed from the initial state, solve the group again from here
+                PDDLMetrics.get_instance().inc("plan_group_resolves")
+                child, writer = self.__submit(group, values)
+                child = self.__wait(child)
+                if child.status != "solved":
+                    return None
+                applied = self.__apply(writer, values, child.plan)
+                if applied is None:
+                    return None
+            values = applied
+            plan.extend(child.plan)
+        return plan if self.env.simulator().holds(self.goals, values) else None
+
+    def __race(self, whole):
+        whole.wait()
+        if whole.status in ("solved", "unsolvable"):
+            # the groups cannot do better than a plan of the whole problem, nor solve unsolvable goals
+            if not self.job.closed:
+                PDDLMetrics.get_instance().inc("plan_decomposition_fallbacks")
+            self.__finish(whole.status, whole.plan)
+
+    def __run(self):
+        try:
+            whole, _ = self.__submit(self.goals, self.values)
+            children = [self.__submit(group, self.values) for group in self.groups]
+            threading.Thread(target=self.__race, args=(whole,), daemon=True).start()
+            plan = self.__stitch(children)
+            if plan is None:
+                # a later group undoes an earlier one or cannot be solved on its own, the whole problem decides
+                whole = self.__wait(whole)
+                status, plan = whole.status, whole.plan if whole.status != "failed" else whole.error
+            else:
+                status = "solved"
+        except InterruptedError:
+            return
+        except Exception as e:
+            status, plan = "failed", repr(e)
+        self.__finish(status, plan)
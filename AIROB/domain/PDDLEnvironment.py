@@ -1,15 +1,39 @@
+import hashlib
+import os
+import re
+import tempfile
 import uuid
 from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from itertools import count, takewhile
 from typing import Optional
+
+import numpy as np
+
 from .PDDLObject import PDDLObject
+from .PDDLState import PDDLState
+from .PDDLPlanCache import PDDLPlanCache
+from .PDDLMetrics import PDDLMetrics
+from .PDDLRelevance import PDDLRelevance
+from .PDDLSimulator import PDDLSimulator
+from .PDDLEvents import PDDLEvents
+from .PDDLLock import PDDLLock
+from .PDDLExecutor import PDDLExecutor
+from .PDDLGoals import PDDLGoals
+from . import PDDLCompat
 
 from unified_planning import Environment
+from unified_planning.io import PDDLWriter
+from unified_planning.io.pddl_writer import ConverterToPDDLString
 from unified_planning.model import Object, Fluent, Problem, InstantaneousAction, Variable, Parameter
 from unified_planning.plans import ActionInstance
-from unified_planning.shortcuts import UserType, BoolType
+from unified_planning.shortcuts import UserType, BoolType, Bool, And
 
 Action = namedtuple("Action", ["name", "kwargs", "preconditions", "effects", "func"])
 Type = namedtuple("Type", ["type", "cls"])
+TypeMetadata = namedtuple("TypeMetadata", ["predicates", "descriptors", "args"])
+PDDLText = namedtuple("PDDLText", ["path", "writer", "namer", "name", "constants", "objects", "mask", "atoms"])
 
 
 def gen_instance_functions(instance):
@@ -21,54 +45,46 @@ def gen_instance_functions(instance):
 
 
 def get_type_predicates(instance, env):
-    data = {}
-    for k, v in gen_instance_functions(instance):
-        if env.func_name(v) in env.rev_predicates.keys():
-            data[k] = v
-    return data
+    return env.type_metadata(instance).predicates
 
 
 def get_type_predicate_descriptors(instance, env):
-    data = {}
-    for k, v in gen_instance_functions(instance):
-        if env.func_name(v) in env.rev_predicates.keys() and not env.predicateHidden(
-                env.rev_predicates[env.func_name(v)]):
-            data[k] = {"name": k, "params": PDDLEnvironment.root_func(v).__annotations__}
-    return data
+    return env.type_metadata(instance).descriptors
 
 
 def get_type_predicate_args(instance, pred, env):
-    f = getattr(instance, pred)
-    if not env.func_name(f) in env.rev_predicates.keys():
-        return {}, 404
-    return {k: v for k, v in PDDLEnvironment.root_func(f).__annotations__.items() if k != 'self'}
+    return env.type_metadata(instance).args.get(pred)
+
+
+def predicate_method(predicate):
+    return lambda self, *args, **kwargs: predicate(self, *args, **kwargs)
 
 
 class PDDLObjectType(Object):
+    # objects are registered through per-type subclasses (see PDDLEnvironment.object_type) that expose the
+    # predicates as methods, so predicate lookups do not reach __getattr__
+
     def __init__(self, instance, type_name, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.instance = instance
-        self.__predicates = {}
-        self.__env = PDDLEnvironment.get_instance()
         self.type_name = type_name
-        for k, v in gen_instance_functions(instance.__class__):
-            if self.__env.func_name(v) in self.__env.rev_predicates.keys():
-                self.__predicates[k] = v
 
     def __getattr__(self, item):
-        if item in self.__predicates:
-            return lambda *args, **kwargs: self.__predicates[item](self, *args, **kwargs)
+        predicates = PDDLEnvironment.get_instance().type_metadata(self.instance.__class__).predicates
+        if item in predicates:
+            return partial(predicates[item], self)
         return getattr(self.instance, item)
 
 
 class PDDLParameter(Parameter):
     def __init__(self, name: str, typename: Type, *args, **kwargs):
         super().__init__(name, typename.type, *args, **kwargs)
-        self.env = PDDLEnvironment.get_instance()
-        self.data = get_type_predicates(typename.cls, self.env)
+        self.predicates = get_type_predicates(typename.cls, PDDLEnvironment.get_instance())
 
     def __getattr__(self, item):
-        return lambda *args, **kwargs: self.data[item](self, *args, **kwargs)
+        if item not in self.predicates:
+            raise AttributeError(item)
+        return partial(self.predicates[item], self)
 
 
 class PDDLActionType(InstantaneousAction):
@@ -104,14 +120,33 @@ class PDDLEnvironment:
 
     def __init__(self):
         self.objects = {}  # id => (object repr, object instance)
+        self.names = []  # object index => id, indices are given in registration order and never reused
+        self.indices = {}  # id => object index
+        self.__serials = count()  # numbers of the created objects, registered or not
         self.types = {}
+        self.metadata = {}  # class => TypeMetadata
+        self.object_types = {}  # class => PDDLObjectType subclass of its objects
         self.hierarchy = {}
         self.predicates = {}
         self.rev_predicates = {}
         self.actions = {}
+        self.executors = {}  # action name => PDDLExecutor
         self.type_action = {}
         self.predicates_compiled = {}
+        self.predicates_static = {}  # predicate => inlined value, None when kept as sparse initial facts
         self.user_actions = {}
+        self.serialized = {}  # (action name, object ids) => serialized step, user message included
+        self.__domain = None  # compiled types, objects, fluents and actions, cloned by problem()
+        self.__pddl = None  # PDDLText of the compiled domain
+        self.__relevance = None
+        self.__simulator = None
+        self.__exact = False  # an exact executor is running, attribute changes are not tracked
+        self.pddl_dir = os.path.join(tempfile.gettempdir(), "airob")
+        self.state = PDDLState()
+        self.plans = PDDLPlanCache()
+        self.goals = PDDLGoals(self)
+        self.events = PDDLEvents()
+        self.lock = PDDLLock()  # execution and state evaluation write, problem building and state queries read
 
     def get_objects_hierarchy(self, type_str):
         return self.hierarchy[type_str]
@@ -138,22 +173,70 @@ class PDDLEnvironment:
             father = self.types[father.__name__].type
 
         self.types[typ.__name__] = Type(UserType(typ.__name__, father=father), typ)
+        self.invalidate_domain()
+
+    def compile_type_metadata(self, typ):
+        predicates, descriptors, args = {}, {}, {}
+        for k, v in gen_instance_functions(typ):
+            name = self.func_name(v)
+            if name not in self.rev_predicates.keys():
+                continue
+            annotations = PDDLEnvironment.root_func(v).__annotations__
+            predicates[k] = v
+            args[k] = {p: t for p, t in annotations.items() if p != 'self'}
+            if not self.predicateHidden(self.rev_predicates[name]):
+                descriptors[k] = {"name": k, "params": annotations}
+        self.metadata[typ] = TypeMetadata(predicates, descriptors, args)
+        self.object_types.pop(typ, None)
+        return self.metadata[typ]
+
+    def object_type(self, typ):
+        if typ not in self.object_types:
+            methods = {k: predicate_method(v) for k, v in self.type_metadata(typ).predicates.items()
+                       if not hasattr(PDDLObjectType, k)}
+            self.object_types[typ] = type(f"{typ.__name__}Object", (PDDLObjectType,), methods)
+        return self.object_types[typ]
+
+    def type_metadata(self, typ):
+        if typ not in self.metadata:
+            return self.compile_type_metadata(typ)
+        return self.metadata[typ]
 
     def get_type(self, typ):
         assert typ.__name__ in self.types
         return self.types[typ.__name__].type
 
+    def serial(self):
+        return next(self.__serials)
+
     def add_object(self, instance: PDDLObject):
-        assert type(instance).__name__ in self.types
-        typ = self.types[type(instance).__name__].type
-        self.objects[instance.get_id()] = PDDLObjectType(instance, type(instance).__name__, instance.get_id(), typ)
-        for t in type(instance).__mro__:
-            if t == PDDLObject or t == object:
-                break
-            if t.__name__ not in self.hierarchy:
-                self.hierarchy[t.__name__] = []
-            self.hierarchy[t.__name__].append(instance.get_id())
-        return self.objects[instance.get_id()]
+        return self.add_objects((instance,))[0]
+
+    def add_objects(self, instances):
+        with self.lock.write():
+            ret = []
+            types = {}  # class => (type, hierarchy lists, wrapper class)
+            touch = self.touch  # one bound method shared by all the objects
+            for instance in instances:
+                cls = type(instance)
+                if cls not in types:
+                    assert cls.__name__ in self.types
+                    chain = takewhile(lambda t: t != PDDLObject and t != object, cls.__mro__)
+                    types[cls] = (self.types[cls.__name__].type, [self.hierarchy.setdefault(t.__name__, []) for t in chain],
+                                  self.object_type(cls))
+                typ, hierarchy, wrapper = types[cls]
+                name = instance.get_id()
+                obj = self.objects[name] = wrapper(instance, cls.__name__, name, typ)
+                index = self.indices.get(name)
+                if index is None:
+                    index = self.indices[name] = len(self.names)
+                    self.names.append(name)
+                for ids in hierarchy:
+                    ids.append(name)
+                instance.track(touch, index)
+                ret.append(obj)
+            self.invalidate_domain()
+            return ret
 
     @staticmethod
     def root_func(func):
@@ -185,12 +268,19 @@ class PDDLEnvironment:
         name, params, kwargs = self.__func_to_params(func)
         self.predicates[func] = (name, BoolType() if not derived else None, kwargs, default, hidden)
         self.rev_predicates[name] = func
+        owner = func.__qualname__.split('.')[0]
+        for typ in [t for t in self.metadata.keys() if owner in map(lambda x: x.__name__, t.__mro__)]:
+            del self.metadata[typ]
+            self.object_types.pop(typ, None)
+        self.invalidate_domain()
 
-    def add_action(self, func, user=False):
+    def add_action(self, func, user=False, exact=False):
         name, params, kwargs = self.__func_to_params(func)
         self.actions[name] = Action(name, kwargs, list(), list(), func)
+        self.executors[name] = PDDLExecutor(self, name, func, kwargs, exact)
         if user and name not in self.user_actions:
             self.user_actions[name] = None
+        self.invalidate_domain()
 
     def add_action_message(self, func, action):
         self.user_actions[action] = func
@@ -199,11 +289,13 @@ class PDDLEnvironment:
         name = self.func_name(func)
         assert name in self.actions.keys()
         self.actions[name].preconditions.append(precond)
+        self.invalidate_domain()
 
     def add_action_effect(self, func, predicate, value: bool):
         name = self.func_name(func)
         assert name in self.actions.keys()
         self.actions[name].effects.append((predicate, value))
+        self.invalidate_domain()
 
     def __for_all(self, tup, *lists):
         if len(lists) == 0:
@@ -212,6 +304,16 @@ class PDDLEnvironment:
             for o in lists[0]:
                 yield from self.__for_all((*tup, o), *lists[1:])
 
+    def __ground_atoms(self, *predicates):
+        for k in predicates if len(predicates) > 0 else self.predicates_compiled.keys():
+            _, _, params, _, _ = self.predicates[k]
+            for values in self.__for_all((), *map(lambda t: self.hierarchy[t], params.values())):
+                yield k, values
+
+    def __evaluate_atom(self, atom):
+        k, values = atom
+        return k(*map(lambda x: self.objects[x].instance, values))
+
     def get_predicate_fn(self, predicate):
         if 'func' in dir(predicate):
             return self.get_predicate_fn(predicate.func)
@@ -231,12 +333,102 @@ class PDDLEnvironment:
     def execute_action(self, action: ActionInstance):
         self.execute_action_raw(action.action.name, action.actual_parameters)
 
-    def execute_action_raw(self, name, parameters):
-        if name not in self.actions:
-            return
-        act = self.actions[name].func
-        parameters = list(map(lambda x: self.objects[str(x)].instance, parameters))
-        act(*parameters)
+    def execute_action_raw(self, name, parameters, guard=False):
+        # returns False when guarded and the preconditions do not hold in the current state
+        with self.lock.write():
+            if name not in self.executors:
+                return False
+            executor = self.executors[name]
+            objects = executor.bind(parameters)
+            assert objects is not None, f"{name}: {list(map(str, parameters))} do not fit the parameters"
+            if self.__domain is None and not guard:
+                executor(objects)
+                return True
+
+            simulator = self.simulator()
+            self.update_state()
+            ids = [obj.name for obj in objects]
+            if guard and not executor.guard(simulator, self.state.values, ids):
+                return False
+            fingerprint = self.state.fingerprint()
+            instance = simulator.instance(name, ids)
+            if executor.exact:
+                self.__exact = True
+                try:
+                    executor(objects)
+                except Exception:
+                    # the action may have stopped halfway, evaluate whatever it could have touched
+                    self.__exact = False
+                    for obj in objects:
+                        self.touch(obj.instance)
+                    self.update_state()
+                    raise
+                finally:
+                    self.__exact = False
+                with PDDLMetrics.get_instance().timed("state"):
+                    delta = self.state.assign(simulator.apply(self.state.values.copy(), instance))
+                    self.__publish(delta)
+            else:
+                executor(objects)
+                self.state.dirty.update(instance.effects.tolist())
+                delta = self.update_state()
+            if len(delta) > 0:
+                self.plans.invalidate(fingerprint)
+            return True
+
+    def execute_actions(self, steps):
+        # runs (name, params) steps in order, stopping before the first user action and at the first step
+        # whose preconditions do not hold or that fails
+        with self.lock.write():
+            ret = []
+            for name, params in steps:
+                outcome = {"action": name, "params": list(params)}
+                ret.append(outcome)
+                if name in self.user_actions:
+                    outcome["status"] = "user"
+                    break
+                if name not in self.executors or self.executors[name].bind(params) is None:
+                    outcome["status"] = "invalid"
+                    break
+                try:
+                    executed = self.execute_action_raw(name, params, guard=True)
+                except Exception as e:
+                    outcome |= {"status": "error", "error": repr(e)}
+                    break
+                if not executed:
+                    outcome["status"] = "inapplicable"
+                    break
+                outcome["status"] = "executed"
+            return ret
+
+    def touch(self, instance):
+        # an attribute of a domain object changed, static facts are only refreshed by an explicit mark_dirty
+        with self.lock.write():
+            if not self.__exact:
+                self.mark_dirty(instance, static=False)
+
+    def mark_dirty(self, instance, predicate=None, static=True):
+        with self.lock.write():
+            if self.__domain is None:
+                return
+            name = self.names[instance.get_index()]
+            for k, v in self.predicates.items():
+                _, ret, params, _, _ = v
+                if ret is None or (predicate is not None and self.func_name(k) != self.func_name(predicate)):
+                    continue
+                if k in self.predicates_static:
+                    if not static:
+                        continue
+                    # static facts are baked into the compiled domain
+                    self.invalidate_domain()
+                    return
+                lists = [self.hierarchy[t] for t in params.values()]
+                for i, ids in enumerate(lists):
+                    if name not in ids:
+                        continue
+                    for values in self.__for_all((), *lists[:i], [name], *lists[i + 1:]):
+                        self.state.mark_dirty((k, values))
+            self.events.dirty()
 
     def user_message(self, action: ActionInstance):
         if action.action.name not in self.user_actions or self.user_actions[action.action.name] is None:
@@ -248,13 +440,39 @@ class PDDLEnvironment:
     def serialize_action(self, action: ActionInstance):
         return {"action": action.action.name, "params": list(map(lambda x: str(x), action.actual_parameters))}
 
+    def serialize_step(self, name, params):
+        # the returned dict is shared by every plan containing the step and must not be modified
+        key = (name, tuple(params))
+        ret = self.serialized.get(key)
+        if ret is None:
+            message = self.user_actions.get(name)
+            ret = {"action": name, "params": list(key[1]), "user": name in self.user_actions,
+                   "user_message": "No Message" if message is None else
+                   message(*map(lambda x: self.objects[x].instance, key[1]))}
+            if len(self.serialized) >= 4096:
+                self.serialized.clear()
+            self.serialized[key] = ret
+        return ret
+
+    def serialize_steps(self, steps):
+        return [self.serialize_step(name, params) for name, params in steps]
+
+    def serialize_plan(self, actions):
+        return self.serialize_steps((a.action.name, map(str, a.actual_parameters)) for a in actions)
+
     def predicate(self, fn):
         key_or_function = self.rev_predicates[self.func_name(fn)]
+        if self.predicates_static.get(key_or_function) is not None:
+            return PDDLEnvironment.__constant(self.predicates_static[key_or_function])
         if key_or_function in self.predicates_compiled:
             return self.predicates_compiled[key_or_function]
         else:
             return key_or_function
 
+    @staticmethod
+    def __constant(value):
+        return lambda *args, **kwargs: Bool(value)
+
     def compile_predicates(self):
         self.predicates_compiled = {}
         for k, v in self.predicates.items():
@@ -265,13 +483,8 @@ class PDDLEnvironment:
             self.predicates_compiled[k] = Fluent(name, ret, **types)
 
     def get_current_state(self):
-        self.compile_predicates()
-        ret = {}
-        for k, v in self.predicates.items():
-            _, ret, params, default, _ = v
-            for values in self.__for_all((), *map(lambda t: self.hierarchy[t], params.values())):
-                ret[f"{k}({', '.join(list(map(str, params.values())))})"] = k(
-                    *map(lambda x: self.objects[x].instance, values))
+        with self.reading():
+            return self.state.to_dict()
 
     @staticmethod
     def __get_func_params(func, *dicts):
@@ -285,39 +498,206 @@ class PDDLEnvironment:
             param_dict[arg_name] = merged[arg_name]
         return param_dict
 
-    def problem(self, name=None):
-        problem = Problem(name if name is not None else str(uuid.uuid1()))
+    def invalidate_domain(self):
+        with self.lock.write():
+            self.__domain = None
+            self.__pddl = None
+            self.__relevance = None
+            self.__simulator = None
+            self.serialized = {}
+            self.goals.clear()
+            self.plans.clear()
+
+    def __compile_domain(self):
+        domain = Problem("domain")
 
         for obj in self.objects.values():
-            problem.add_object(obj)
+            domain.add_object(obj)
 
-        # create predicates
         self.compile_predicates()
-        for k, v in self.predicates.items():
-            _, ret, params, default, _ = v
-            if ret is None:
-                continue
-            problem.add_fluent(self.predicates_compiled[k], default_initial_value=default)
+        self.predicates_static = {}
 
-            for values in self.__for_all((), *map(lambda t: self.hierarchy[t], params.values())):
-                problem.set_initial_value(
-                    self.predicates_compiled[k](*map(lambda x: self.objects[x], values)),
-                    k(*map(lambda x: self.objects[x].instance, values))
-                )
-
-        # Actions
+        # Actions, effects first as they tell which predicates can change
+        actions = []
         for name, args, pre, post, _ in self.actions.values():
             act = PDDLActionType(name, **{k: self.types[v] for k, v in args.items()})
             params = {k: act.parameter(k) for k, v in args.items()}
-            # vars = {f"var_{k}": Variable(k, self.types[v].type) for k, v in args.items()}
+            for q, v in post:
+                act.add_effect(q(**PDDLEnvironment.__get_func_params(q, {"env": self.get_instance()}, params)), v)
+            actions.append((act, params, pre))
+        touched = {e.fluent.fluent().name for act, _, _ in actions for e in act.effects}
 
+        # Static predicates: constant ones are inlined, the others only keep their non default facts
+        for k in self.predicates_compiled.keys():
+            name, _, _, default, _ = self.predicates[k]
+            if name in touched:
+                continue
+            values = {atom: self.__evaluate_atom(atom) for atom in self.__ground_atoms(k)}
+            for atom, value in values.items():
+                self.state.set(atom, value)
+            if len(set(values.values())) > 1:
+                self.predicates_static[k] = None
+            else:
+                self.predicates_static[k] = next(iter(values.values()), default)
+
+        # create predicates
+        for k, fluent in self.predicates_compiled.items():
+            _, _, _, default, _ = self.predicates[k]
+            if self.predicates_static.get(k) is not None:
+                continue
+            domain.add_fluent(fluent, default_initial_value=default)
+            if k not in self.predicates_static:
+                continue
+            for atom in self.__ground_atoms(k):
+                if self.state.get(atom) != default:
+                    domain.set_initial_value(fluent(*map(lambda x: self.objects[x], atom[1])), self.state.get(atom))
+
+        for act, params, pre in actions:
+            # vars = {f"var_{k}": Variable(k, self.types[v].type) for k, v in args.items()}
             for p in pre:
                 act.add_precondition(p(**PDDLEnvironment.__get_func_params(p, {"env": self.get_instance()}, params)))
-            for q, v in post:
-                act.add_effect(q(**PDDLEnvironment.__get_func_params(q, {"env": self.get_instance()}, params)), v)
-            problem.add_action(act)
+            domain.add_action(act)
+
+        return domain
+
+    def domain(self):
+        if self.__domain is None:
+            with self.lock.write(), PDDLMetrics.get_instance().timed("domain"):
+                if self.__domain is not None:
+                    return self.__domain
+                self.state.reset({k: (name, list(params.values()))
+                                  for k, (name, ret, params, _, _) in self.predicates.items() if ret is not None},
+                                 self.hierarchy, self.indices)
+                self.__domain = self.__compile_domain()
+                for atom in self.__ground_atoms(*filter(lambda x: x not in self.predicates_static, self.predicates_compiled)):
+                    self.state.mark_dirty(atom)
+                self.events.reset()
+        return self.__domain
+
+    @contextmanager
+    def reading(self):
+        # read lock over a compiled domain and an up to date state, the write side is only taken when the domain
+        # has to be compiled or dirty atoms evaluated, so readers do not serialize behind each other
+        nested = self.lock.reading()
+        while True:
+            self.lock.acquire_read()
+            if nested or (self.__domain is not None and len(self.state.dirty) == 0):
+                break
+            self.lock.release_read()
+            self.update_state()
+        try:
+            yield
+        finally:
+            self.lock.release_read()
+
+    def update_state(self):
+        with self.lock.write():
+            self.domain()
+            with PDDLMetrics.get_instance().timed("state"):
+                delta = self.state.update(self.__evaluate_atom)
+                self.__publish(delta)
+            return delta
+
+    def __publish(self, delta):
+        for (k, values), value in delta.items():
+            self.__domain.set_initial_value(self.predicates_compiled[k](*map(lambda x: self.objects[x], values)), value)
+        if len(delta) > 0:
+            self.events.publish(self.state.version, [self.state.index(atom) for atom in delta])
 
-        return problem
+    def problem(self, name=None):
+        with self.reading():
+            with PDDLMetrics.get_instance().timed("problem"):
+                problem = self.domain().clone()
+                problem.name = name if name is not None else str(uuid.uuid1())
+            return problem
+
+    def __render_domain(self):
+        writer = PDDLWriter(self.domain())
+        text = writer.get_domain()
+        namer = PDDLCompat.namer(writer)
+        path = os.path.join(self.pddl_dir, f"domain-{hashlib.blake2b(text.encode(), digest_size=16).hexdigest()}.pddl")
+        if not os.path.exists(path):
+            os.makedirs(self.pddl_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, path)
+
+        # objects used by the actions are domain constants and must not be redeclared
+        constants = {o.name for objects in writer.domain_objects.values() for o in objects}
+        objects = self.__objects_text(namer, constants)
+
+        # inlined static predicates do not exist in the domain
+        mask = np.ones(len(self.state), dtype=bool)
+        for k, value in self.predicates_static.items():
+            if value is not None:
+                _, offset, _, shape = self.state.layout[k]
+                mask[offset:offset + int(np.prod(shape, dtype=np.int64))] = False
+
+        name = re.match(r"\(define \(domain (\S+)\)", text).group(1)
+        self.__pddl = PDDLText(path, writer, namer, name, constants, objects, mask, {})
+        return self.__pddl
+
+    def __objects_text(self, namer, constants, ids=None):
+        objects = {}
+        for x in self.objects.keys() if ids is None else ids:
+            if x not in constants:
+                obj = self.objects[x]
+                objects.setdefault(namer(obj.type), []).append(namer(obj))
+        return "(:objects" + "".join(f"\n   {' '.join(v)} - {k}" for k, v in objects.items()) + "\n )"
+
+    def relevant_objects(self, goals, values=None):
+        return self.prune(goals, values).objects
+
+    def prune(self, goals, values=None):
+        # Pruned(objects, goals) for rendering a smaller problem from values or the current state,
+        # see PDDLRelevance.prune
+        with self.reading():
+            return self.relevance().prune(goals, values)
+
+    def relevance(self):
+        domain = self.domain()
+        if self.__relevance is None:
+            self.__relevance = PDDLRelevance(self, domain)
+        return self.__relevance
+
+    def simulator(self):
+        domain = self.domain()
+        if self.__simulator is None:
+            self.__simulator = PDDLSimulator(self, domain)
+        return self.__simulator
+
+    def simulate(self, steps, goals=None, values=None):
+        # steps: (action name, object ids), applied to a copy of values or of the current state
+        with self.reading():
+            with PDDLMetrics.get_instance().timed("simulate"):
+                return self.simulator().simulate(steps, self.state.values if values is None else values, goals)
+
+    def __atom_text(self, pddl, index):
+        if index not in pddl.atoms:
+            k, ids = self.state.atom(index)
+            names = [pddl.namer(self.predicates_compiled[k])]
+            names.extend(pddl.namer(self.objects[x]) for x in ids)
+            pddl.atoms[index] = f"({' '.join(names)})"
+        return pddl.atoms[index]
+
+    def pddl(self, goals, name="problem", objects=None, values=None):
+        with self.reading():
+            with PDDLMetrics.get_instance().timed("render"):
+                pddl = self.__pddl if self.__pddl is not None else self.__render_domain()
+                text, mask = pddl.objects, pddl.mask
+                if objects is not None:
+                    # only the given objects, and the facts about them
+                    text = self.__objects_text(pddl.namer, pddl.constants, sorted(objects, key=self.indices.__getitem__))
+                    mask = mask & self.state.mask(set(objects) | pddl.constants)
+                values = self.state.values if values is None else values
+                init = " ".join(self.__atom_text(pddl, int(i)) for i in np.flatnonzero(values & mask))
+                converter = ConverterToPDDLString(self.__domain.environment, pddl.namer)
+                goal = And(*goals).simplify()
+                goal = [] if goal.is_true() else goal.args if goal.is_and() else [goal]
+                problem = (f"(define (problem {name}-problem)\n (:domain {pddl.name})\n {text}\n"
+                           f" (:init {init})\n (:goal (and {' '.join(map(converter.convert, goal))})))\n")
+            return pddl.path, problem, pddl.writer
 
     def var(self, typ):
         assert typ.__name__ in self.types
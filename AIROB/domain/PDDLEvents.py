@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class PDDLSubscription:
+    def __init__(self, version):
+        self.since = version
+        self.version = version
+        self.changes = set()  # state indices changed since the last drain
+        self.reset = False
+        self.dirty = False  # atoms were marked dirty and nobody evaluated them yet
+        self.closed = False
+
+
+class PDDLEvents:
+    # Fan-out of the state changes to the streaming clients. Changes are coalesced per subscriber, a
+    # subscriber that drains late gets every atom changed since its last drain once, with its latest value.
+
+    def __init__(self):
+        self.subscribers = set()
+        self.__condition = threading.Condition()
+
+    def subscribe(self, version):
+        subscription = PDDLSubscription(version)
+        with self.__condition:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.__condition:
+            subscription.closed = True
+            self.subscribers.discard(subscription)
+            self.__condition.notify_all()
+
+    def publish(self, version, indices):
+        with self.__condition:
+            for subscription in self.subscribers:
+                subscription.version = version
+                subscription.changes.update(indices)
+            self.__condition.notify_all()
+
+    def reset(self):
+        # the state layout changed, subscribers need the whole state again
+        with self.__condition:
+            for subscription in self.subscribers:
+                subscription.reset = True
+            self.__condition.notify_all()
+
+    def dirty(self):
+        with self.__condition:
+            if len(self.subscribers) == 0:
+                return
+            for subscription in self.subscribers:
+                subscription.dirty = True
+            self.__condition.notify_all()
+
+    def wait(self, subscription, timeout=None, coalesce=0.05):
+        # blocks until the subscription has something to report, then waits coalesce seconds for more changes
+        with self.__condition:
+            self.__condition.wait_for(lambda: subscription.closed or subscription.reset or subscription.dirty or
+                                      len(subscription.changes) > 0, timeout)
+            ready = subscription.reset or subscription.dirty or len(subscription.changes) > 0
+        if ready and coalesce > 0:
+            time.sleep(coalesce)
+        return ready and not subscription.closed
+
+    def drain(self, subscription):
+        with self.__condition:
+            ret = (subscription.since, subscription.version, sorted(subscription.changes), subscription.reset)
+            subscription.since = subscription.version
+            subscription.changes = set()
+            subscription.reset = False
+            subscription.dirty = False
+        return ret
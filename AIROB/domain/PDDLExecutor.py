@@ -0,0 +1,38 @@
+class PDDLExecutor:
+    # Compiled form of a registered action. Parameters are bound straight to the object instances with their
+    # types checked, and with exact set the declared effects are trusted to be everything the action changes,
+    # so the environment writes them to the state store instead of evaluating the touched predicates again.
+
+    def __init__(self, env, name, func, kwargs, exact=False):
+        self.env = env
+        self.name = name
+        self.func = func
+        self.params = tuple(kwargs.keys())
+        self.type_names = tuple(kwargs.values())
+        self.exact = exact
+        self.__classes = None  # the types are declared after their actions, resolved on the first bind
+
+    def classes(self):
+        if self.__classes is None:
+            self.__classes = tuple(self.env.types[t].cls for t in self.type_names)
+        return self.__classes
+
+    def bind(self, params):
+        # object wrappers for the given ids, None when they do not fit the parameters
+        if not isinstance(params, list) or len(params) != len(self.type_names):
+            return None
+        objects = self.env.objects
+        ret = []
+        for x, cls in zip(params, self.classes()):
+            obj = objects.get(str(x))
+            if obj is None or not isinstance(obj.instance, cls):
+                return None
+            ret.append(obj)
+        return ret
+
+    def guard(self, simulator, values, params):
+        # the preconditions hold in values
+        return simulator.applicable(values, simulator.instance(self.name, params))
+
+    def __call__(self, objects):
+        return self.func(*[obj.instance for obj in objects])
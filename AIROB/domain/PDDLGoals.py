@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+
+from unified_planning.shortcuts import Not
+
+FIELDS = ("object", "predicate", "params", "value")
+
+
+class PDDLGoals:
+    # Compiles the goal atoms of the requests, {"object", "predicate", "params", "value"}, to expressions.
+    # Atoms are normalized to (object, predicate, params, value) tuples, which key a bounded LRU cache of the
+    # compiled expressions. The expressions use the compiled fluents, so the cache is cleared with the domain.
+
+    def __init__(self, env, size=1024):
+        self.env = env
+        self.size = size
+        self.entries = OrderedDict()  # normalized atom => expression
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def normalize(goal):
+        return goal["object"], goal["predicate"], tuple(sorted(goal["params"].items())), bool(goal["value"])
+
+    def validate(self, goal):
+        # None when the atom is valid, the error otherwise
+        if not isinstance(goal, dict) or any(k not in goal for k in FIELDS):
+            return {"error": "missing fields", "fields": [k for k in FIELDS if not isinstance(goal, dict) or k not in goal]}
+        obj = self.env.objects.get(goal["object"]) if isinstance(goal["object"], str) else None
+        if obj is None:
+            return {"error": "unknown object", "object": goal["object"]}
+        args = self.env.type_metadata(obj.instance.__class__).args
+        if not isinstance(goal["predicate"], str) or goal["predicate"] not in args:
+            return {"error": "unknown predicate", "object": goal["object"], "predicate": goal["predicate"]}
+        args = {k: t if isinstance(t, str) else t.__name__ for k, t in args[goal["predicate"]].items()}
+        if not isinstance(goal["params"], dict) or set(goal["params"].keys()) != set(args.keys()):
+            return {"error": "wrong parameters", "predicate": goal["predicate"], "expected": args}
+        for k, t in args.items():
+            param = self.env.objects.get(goal["params"][k]) if isinstance(goal["params"][k], str) else None
+            if param is None or t not in self.env.types or not isinstance(param.instance, self.env.types[t].cls):
+                return {"error": "wrong parameter", "param": k, "object": goal["params"][k], "expected": t}
+        if not isinstance(goal["value"], bool):
+            return {"error": "value is not a boolean", "value": goal["value"]}
+        return None
+
+    def compile(self, goals):
+        # returns the expressions and the errors of the invalid atoms, nothing is compiled unless all are valid
+        if not isinstance(goals, list):
+            return None, [{"error": "goal is not a list of atoms"}]
+        errors = []
+        for i, goal in enumerate(goals):
+            error = self.validate(goal)
+            if error is not None:
+                errors.append({"index": i} | error)
+        if len(errors) > 0:
+            return None, errors
+        self.env.domain()
+        return [self.expression(self.normalize(goal)) for goal in goals], []
+
+    def expression(self, atom):
+        with self.__lock:
+            if atom in self.entries:
+                self.entries.move_to_end(atom)
+                self.hits += 1
+                return self.entries[atom]
+            self.misses += 1
+        name, predicate, params, value = atom
+        objects, params = self.env.objects, dict(params)
+        # fluents only take positional arguments, in the order of the predicate's parameters
+        args = self.env.type_metadata(objects[name].instance.__class__).args[predicate]
+        node = getattr(objects[name], predicate)(*[objects[params[k]] for k in args])
+        node = node if value else Not(node)
+        with self.__lock:
+            self.entries[atom] = node
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return node
+
+    def clear(self):
+        with self.__lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.__lock:
+            return {"size": len(self.entries), "capacity": self.size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,389 @@
+import multiprocessing
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+
+from unified_planning.engines import PlanGenerationResultStatus
+from unified_planning.environment import get_environment
+from unified_planning.io import PDDLReader
+from unified_planning.model import ProblemKind
+from unified_planning.shortcuts import OneshotPlanner
+
+from . import PDDLCompat
+from .PDDLMetrics import PDDLMetrics
+
+SOLVED = (PlanGenerationResultStatus.SOLVED_SATISFICING, PlanGenerationResultStatus.SOLVED_OPTIMALLY)
+UNSOLVABLE = (PlanGenerationResultStatus.UNSOLVABLE_PROVEN, PlanGenerationResultStatus.UNSOLVABLE_INCOMPLETELY)
+
+
+def status(result_status, plan):
+    if result_status in SOLVED:
+        return "solved", plan
+    if result_status in UNSOLVABLE:
+        return "unsolvable", None
+    return "failed", result_status.name
+
+
+def run(planner, domain, problem, tmp):
+    # runs a PDDL planner straight on the files, skipping the problem round trip through unified-planning
+    plan = os.path.join(tmp, "plan.txt")
+    process = subprocess.run(PDDLCompat.command(planner, domain, problem, plan), cwd=tmp, capture_output=True)
+    steps = None
+    if os.path.isfile(plan):
+        with open(plan) as f:
+            steps = [line.strip()[1:-1].split() for line in f if line.startswith("(")]
+        steps = [(s[0], s[1:]) for s in steps]
+    return status(PDDLCompat.result_status(planner, steps, process.returncode), steps)
+
+
+def planner(planners, engine, kind):
+    # warm planners of a worker, created on their first use and kept until the worker exits
+    if (engine, kind) not in planners:
+        planners[(engine, kind)] = OneshotPlanner(problem_kind=kind, name=engine)
+    return planners[(engine, kind)]
+
+
+def solve(planners, engine, domain, problem):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "problem.pddl")
+        with open(path, "w") as f:
+            f.write(problem)
+        if PDDLCompat.direct(get_environment().factory.engine(engine)):
+            return run(planner(planners, engine, ProblemKind()), domain, path, tmp)
+        problem = PDDLReader().parse_problem(domain, path)
+        result = planner(planners, engine, problem.kind).solve(problem)
+    plan = [(a.action.name, [str(p) for p in a.actual_parameters]) for a in result.plan.actions] if result.plan else None
+    return status(result.status, plan)
+
+
+def worker(conn):
+    # own process group, so that cancelling a job also kills the planner subprocesses
+    os.setpgrp()
+    get_environment().credits_stream = None
+    # a worker solves one problem at a time, so its planners are reused without any locking, the waits for
+    # a worker are the job manager's
+    planners = {}  # (engine, problem kind) => planner
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        domain, problem, engine = task
+        try:
+            conn.send(solve(planners, engine, domain, problem))
+        except Exception as e:
+            conn.send(("failed", repr(e)))
+    for p in planners.values():
+        p.destroy()
+
+
+class PDDLJob:
+    def __init__(self, domain, problem, engines=(), callback=None, deadline=None, fallback=None):
+        self.id = uuid.uuid4().hex
+        self.task = (domain, problem)
+        self.fallback = fallback  # problem solved instead when this one turns out unsolvable
+        self.engines = list(engines)
+        self.callback = callback
+        self.status = "queued"
+        self.plan = None
+        self.error = None
+        self.engine = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.deadline = self.created + deadline if deadline is not None else None
+        self.runs = len(self.engines)  # engine runs not returned yet
+        self.best = None  # (engine, plan)
+        self.errors = {}
+        self.closed = False
+        self.children = []  # jobs this one is waiting for
+        self.__event = threading.Event()
+
+    def done(self):
+        return self.status not in ("queued", "running")
+
+    def wait(self, timeout=None):
+        return self.__event.wait(timeout)
+
+    def finish(self, status, result, engine=None):
+        self.finished = time.time()
+        self.task = None
+        self.fallback = None
+        self.engine = engine
+        if status == "solved":
+            self.plan = self.callback(result) if self.callback is not None else result
+        elif status == "failed":
+            self.error = result
+        elif status == "unsolvable":
+            self.plan = []
+        self.status = status
+        self.__event.set()
+
+    def to_dict(self):
+        ret = {"id": self.id, "status": self.status, "created": self.created, "started": self.started,
+               "finished": self.finished}
+        if self.engine is not None:
+            ret["engine"] = self.engine
+        if self.plan is not None:
+            ret["plan"] = self.plan
+        if self.error is not None:
+            ret["error"] = self.error
+        return ret
+
+
+class PDDLJobManager:
+    __PDDL_JOB_MANAGER_INSTANCE = None
+
+    def __init__(self, engines=('fast-downward',), size=1, deadline=None, history=256):
+        self.engines = list(engines)
+        self.size = size
+        self.deadline = deadline
+        self.history = history
+        self.jobs = OrderedDict()  # id => PDDLJob
+        self.queue = deque()  # (job, engine)
+        self.workers = []  # [process, connection, (job, engine, start) or None]
+        self.requests = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.engine_stats = {}
+        self.__ctx = multiprocessing.get_context("spawn")
+        self.__lock = threading.Lock()
+        self.__wakeup_r, self.__wakeup_w = self.__ctx.Pipe(duplex=False)
+        self.__closed = False
+        for _ in range(size):
+            self.workers.append(self.__spawn())
+        self.__dispatcher = threading.Thread(target=self.__run, daemon=True)
+        self.__dispatcher.start()
+
+    @staticmethod
+    def get_instance():
+        if PDDLJobManager.__PDDL_JOB_MANAGER_INSTANCE is None:
+            PDDLJobManager.__PDDL_JOB_MANAGER_INSTANCE = PDDLJobManager()
+        return PDDLJobManager.__PDDL_JOB_MANAGER_INSTANCE
+
+    @staticmethod
+    def init(engines, size, deadline=None):
+        if PDDLJobManager.__PDDL_JOB_MANAGER_INSTANCE is not None:
+            PDDLJobManager.__PDDL_JOB_MANAGER_INSTANCE.close()
+        PDDLJobManager.__PDDL_JOB_MANAGER_INSTANCE = PDDLJobManager(engines, size, deadline)
+        return PDDLJobManager.__PDDL_JOB_MANAGER_INSTANCE
+
+    def __spawn(self):
+        conn, child = self.__ctx.Pipe()
+        process = self.__ctx.Process(target=worker, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        return [process, conn, None]
+
+    def __kill(self, w):
+        try:
+            os.killpg(w[0].pid, signal.SIGKILL)
+        except ProcessLookupError:
+            w[0].kill()
+        w[0].join()
+        w[1].close()
+
+    def __wakeup(self):
+        self.__wakeup_w.send_bytes(b"")
+
+    def __engine_stats(self, engine):
+        return self.engine_stats.setdefault(engine, {"runs": 0, "wins": 0, "solved": 0, "failed": 0, "time": 0.0})
+
+    def __add(self, job):
+        self.jobs[job.id] = job
+        finished = [k for k, v in self.jobs.items() if v.done()]
+        for k in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[k]
+
+    def submit(self, domain, problem, callback=None, engines=None, deadline=None, fallback=None):
+        engines = engines if engines is not None else self.engines
+        job = PDDLJob(domain, problem, engines, callback, deadline if deadline is not None else self.deadline,
+                      fallback)
+        with self.__lock:
+            self.__add(job)
+            for e in job.engines:
+                self.queue.append((job, e))
+        self.__wakeup()
+        return job
+
+    def completed(self, plan, status="solved"):
+        # a job finished without planning, e.g. a cached plan or a goal that is false whatever the state
+        job = PDDLJob(None, None)
+        job.closed = True
+        job.finish(status, plan)
+        with self.__lock:
+            self.__add(job)
+        return job
+
+    def track(self, job):
+        # jobs run outside of the workers, e.g. waiting for other jobs
+        job.status = "running"
+        job.started = time.time()
+        with self.__lock:
+            self.__add(job)
+        return job
+
+    def get(self, id):
+        with self.__lock:
+            return self.jobs.get(id)
+
+    def cancel(self, id):
+        with self.__lock:
+            job = self.jobs.get(id)
+            if job is None or job.closed:
+                return job
+            job.closed = True
+        job.finish("cancelled", None)
+        for child in job.children:
+            self.cancel(child.id)
+        self.__wakeup()
+        return job
+
+    def __dispatch(self):
+        # drop the runs of closed jobs, killing the workers still busy on them
+        self.queue = deque(r for r in self.queue if not r[0].closed)
+        for i, w in enumerate(self.workers):
+            if w[2] is not None and w[2][0].closed:
+                self.__kill(w)
+                w = self.workers[i] = self.__spawn()
+            if w[2] is not None or len(self.queue) == 0:
+                continue
+            job, engine = self.queue.popleft()
+            now = time.time()
+            if job.started is None:
+                job.status = "running"
+                job.started = now
+                self.requests += 1
+                PDDLMetrics.get_instance().observe("queue_wait_seconds", now - job.created)
+                self.wait_time += now - job.created
+                self.max_wait_time = max(self.max_wait_time, now - job.created)
+            w[2] = (job, engine, now)
+            try:
+                w[1].send((*job.task, engine))
+            except OSError:
+                # the worker is gone, its connection reads as closed and the run fails in __receive
+                pass
+
+    def __close(self, job):
+        # decides whether a job is over, must be called with the lock held
+        if job.closed:
+            return None
+        if job.best is not None and (job.runs == 0 or job.deadline is None or time.time() >= job.deadline):
+            engine, plan = job.best
+            self.__engine_stats(engine)["wins"] += 1
+            job.closed = True
+            return job, ("solved", plan, engine)
+        if job.runs > 0:
+            return None
+        if job.fallback is not None:
+            # the pruned problem can also make a planner fail, not only come out unsolvable
+            job.task, job.fallback = (job.task[0], job.fallback), None
+            PDDLMetrics.get_instance().inc("plan_fallbacks")
+            job.runs = len(job.engines)
+            job.errors = {}
+            self.queue.extend((job, e) for e in job.engines)
+            return None
+        job.closed = True
+        if "unsolvable" in job.errors.values():
+            return job, ("unsolvable", None)
+        return job, ("failed", "; ".join(f"{k}: {v}" for k, v in job.errors.items()))
+
+    def __receive(self, conn):
+        with self.__lock:
+            w = next((w for w in self.workers if w[1] is conn), None)
+            if w is None or w[2] is None:
+                return None
+            (job, engine, start), w[2] = w[2], None
+            try:
+                status, result = conn.recv()
+            except (EOFError, OSError):
+                self.__kill(w)
+                self.workers[self.workers.index(w)] = self.__spawn()
+                status, result = "failed", "planner worker died"
+
+            stats = self.__engine_stats(engine)
+            stats["runs"] += 1
+            stats["time"] += time.time() - start
+            PDDLMetrics.get_instance().observe("solve_seconds", time.time() - start, engine=engine, status=status)
+            stats["solved" if status == "solved" else "failed"] += 1
+
+            job.runs -= 1
+            if status == "solved":
+                if job.best is None or len(result) < len(job.best[1]):
+                    job.best = (engine, result)
+            else:
+                job.errors[engine] = status if status == "unsolvable" else result
+            return self.__close(job)
+
+    def __expired(self):
+        with self.__lock:
+            now = time.time()
+            jobs = {w[2][0] for w in self.workers if w[2] is not None}
+            closed = [self.__close(j) for j in jobs if j.deadline is not None and j.deadline <= now]
+            timeout = min((j.deadline - now for j in jobs if j.deadline is not None and j.deadline > now), default=None)
+            return closed, timeout
+
+    def __step(self, closed):
+        expired, timeout = self.__expired()
+        closed.extend(expired)
+        with self.__lock:
+            self.__dispatch()
+            conns = [w[1] for w in self.workers if w[2] is not None]
+        for conn in wait(conns + [self.__wakeup_r], timeout):
+            if conn is self.__wakeup_r:
+                conn.recv_bytes()
+            else:
+                closed.append(self.__receive(conn))
+
+    def __run(self):
+        while not self.__closed:
+            closed = []  # jobs decided in this step, finished even when the step fails halfway
+            try:
+                self.__step(closed)
+            except Exception:
+                # a broken worker must not stop the dispatcher, the other jobs would stay running forever
+                traceback.print_exc()
+                time.sleep(0.1)
+            for c in closed:
+                if c is None:
+                    continue
+                job, result = c
+                try:
+                    job.finish(*result)
+                except Exception as e:
+                    job.finish("failed", repr(e))
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "planners": self.engines,
+                "size": self.size,
+                "busy": len([w for w in self.workers if w[2] is not None]),
+                "waiting": len(self.queue),
+                "jobs": len(self.jobs),
+                "requests": self.requests,
+                "wait_time": self.wait_time,
+                "avg_wait_time": self.wait_time / self.requests if self.requests > 0 else 0.0,
+                "max_wait_time": self.max_wait_time,
+                "engines": {k: v | {
+                    "win_rate": v["wins"] / v["runs"] if v["runs"] > 0 else 0.0,
+                    "avg_time": v["time"] / v["runs"] if v["runs"] > 0 else 0.0,
+                } for k, v in self.engine_stats.items()},
+            }
+
+    def close(self):
+        self.__closed = True
+        self.__wakeup()
+        with self.__lock:
+            for w in self.workers:
+                if w[2] is None:
+                    w[1].send(None)
+                    w[0].join(1)
+                self.__kill(w)
+            self.workers = []
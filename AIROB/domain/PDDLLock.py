@@ -0,0 +1,72 @@
+import threading
+from contextlib import contextmanager
+
+
+class PDDLLock:
+    # Readers/writer lock. Both sides are reentrant and the writer may also read, but a reader cannot become
+    # a writer. Waiting writers block new readers so that a stream of state queries cannot starve them.
+
+    def __init__(self):
+        self.__condition = threading.Condition()
+        self.__readers = 0
+        self.__writer = None
+        self.__writes = 0
+        self.__waiting = 0
+        self.__local = threading.local()
+
+    def acquire_read(self):
+        reads = getattr(self.__local, "reads", 0)
+        if reads == 0 and self.__writer != threading.get_ident():
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__writer is None and self.__waiting == 0)
+                self.__readers += 1
+            self.__local.shared = True
+        elif reads == 0:
+            self.__local.shared = False
+        self.__local.reads = reads + 1
+
+    def release_read(self):
+        self.__local.reads -= 1
+        if self.__local.reads == 0 and self.__local.shared:
+            with self.__condition:
+                self.__readers -= 1
+                self.__condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self.__writer == me:
+            self.__writes += 1
+            return
+        assert getattr(self.__local, "reads", 0) == 0, "a read lock cannot be upgraded"
+        with self.__condition:
+            self.__waiting += 1
+            self.__condition.wait_for(lambda: self.__writer is None and self.__readers == 0)
+            self.__waiting -= 1
+            self.__writer = me
+            self.__writes = 1
+
+    def release_write(self):
+        self.__writes -= 1
+        if self.__writes == 0:
+            with self.__condition:
+                self.__writer = None
+                self.__condition.notify_all()
+
+    def reading(self):
+        return getattr(self.__local, "reads", 0) > 0
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
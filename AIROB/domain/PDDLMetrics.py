@@ -0,0 +1,91 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def format_labels(labels, **extra):
+    labels = dict(labels) | extra
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class PDDLMetrics:
+    __PDDL_METRICS_INSTANCE = None
+
+    def __init__(self, prefix="airob"):
+        self.prefix = prefix
+        self.counters = {}  # name => {labels: value}
+        self.histograms = {}  # name => {labels: Histogram}
+        self.collectors = []  # callables returning {name: value or {labels: value}} gauges
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def get_instance():
+        if PDDLMetrics.__PDDL_METRICS_INSTANCE is None:
+            PDDLMetrics.__PDDL_METRICS_INSTANCE = PDDLMetrics()
+        return PDDLMetrics.__PDDL_METRICS_INSTANCE
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            counter = self.counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            histogram = self.histograms.setdefault(name, {})
+            if key not in histogram:
+                histogram[key] = Histogram()
+            histogram[key].observe(value)
+
+    @contextmanager
+    def timed(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("phase_seconds", time.perf_counter() - start, phase=phase)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self.__lock:
+            for name, values in self.counters.items():
+                lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+                for labels, value in values.items():
+                    lines.append(f"{self.prefix}_{name}_total{format_labels(labels)} {value}")
+            for name, values in self.histograms.items():
+                lines.append(f"# TYPE {self.prefix}_{name} histogram")
+                for labels, h in values.items():
+                    cumulative = 0
+                    for le, count in zip((*map(str, h.buckets), "+Inf"), h.counts):
+                        cumulative += count
+                        lines.append(f"{self.prefix}_{name}_bucket{format_labels(labels, le=le)} {cumulative}")
+                    lines.append(f"{self.prefix}_{name}_sum{format_labels(labels)} {h.sum}")
+                    lines.append(f"{self.prefix}_{name}_count{format_labels(labels)} {h.count}")
+        for collector in self.collectors:
+            for name, value in collector().items():
+                lines.append(f"# TYPE {self.prefix}_{name} gauge")
+                for labels, v in (value.items() if isinstance(value, dict) else [((), value)]):
+                    lines.append(f"{self.prefix}_{name}{format_labels(labels)} {float(v)}")
+        return "\n".join(lines) + "\n"
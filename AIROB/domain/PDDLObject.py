@@ -1,14 +1,31 @@
-import uuid
-
-
 class PDDLObject:
     def __init__(self):
-        self.__id = f"inst_{str(uuid.uuid1()).replace('-', '')}"
+        from .PDDLEnvironment import PDDLEnvironment  # the environment module imports this one
+        self.__serial = PDDLEnvironment.get_instance().serial()
+        self.__id = f"inst_{self.__serial}"
+        self.__index = None  # position in the environment's object table once registered
+        self.__listener = None  # called with the object on attribute changes once registered
 
     def get_id(self) -> str:
         return self.__id
 
+    def get_index(self):
+        return self.__index
+
+    def track(self, listener, index):
+        self.__index = index
+        self.__listener = listener
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        listener = self.__dict__.get("_PDDLObject__listener")
+        if listener is not None:
+            listener(self)
+
     def __eq__(self, other) -> bool:
         if isinstance(other, PDDLObject):
-            return self.__id == other.__id
+            return self.__serial == other.__serial
         return False
+
+    def __hash__(self):
+        return self.__serial
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .PDDLGoals import PDDLGoals
+
+
+class PDDLPlanCache:
+    def __init__(self, size=128, ttl=300.0):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # (state fingerprint, goal) => (expiration, serialized plan)
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def goal_key(goals):
+        return tuple(sorted(PDDLGoals.normalize(g) for g in goals))
+
+    def get(self, fingerprint, goal):
+        key = (fingerprint, goal)
+        with self.__lock:
+            if key not in self.entries or self.entries[key][0] < time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][1]
+
+    def put(self, fingerprint, goal, plan):
+        with self.__lock:
+            self.entries[(fingerprint, goal)] = (time.monotonic() + self.ttl, plan)
+            self.entries.move_to_end((fingerprint, goal))
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, fingerprint, goal):
+        with self.__lock:
+            self.entries.pop((fingerprint, goal), None)
+
+    def invalidate(self, fingerprint):
+        with self.__lock:
+            for key in [k for k in self.entries.keys() if k[0] == fingerprint]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.__lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.__lock:
+            return {"size": len(self.entries), "capacity": self.size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,290 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+Schema = namedtuple("Schema", ["name", "params", "types", "statics", "literals", "preconditions", "effects"])
+Pruned = namedtuple("Pruned", ["objects", "goals"])
+
+
+def flatten(node):
+    if node.is_and():
+        for a in node.args:
+            yield from flatten(a)
+    else:
+        yield node
+
+
+class PDDLRelevance:
+    # Backward reachability from the goal literals over the compiled actions.
+    # An atom needs achievers only if its current value is wrong or some relevant action can flip it,
+    # the objects of the atoms and actions reached this way are the ones that can matter for the goal.
+
+    def __init__(self, env, domain):
+        self.env = env
+        self.state = env.state
+        self.__lock = threading.Lock()  # objects() keeps its search state on the instance
+        self.achievers = {}  # (predicate, value) => [(schema, effect arguments)]
+        self.quantified = set()  # predicates read under a quantifier, they relate objects no action shares
+        for action in domain.actions:
+            for p in action.preconditions:
+                self.__quantified(p, False)
+            params = [p.name for p in action.parameters]
+            types = {p.name: p.type.name for p in action.parameters}
+            statics, literals, dead = [], [], False
+            for c in (c for p in action.preconditions for c in flatten(p)):
+                if c.is_bool_constant():
+                    dead = dead or c.is_false()
+                literal = c.arg(0) if c.is_not() else c
+                if literal.is_fluent_exp() and all(map(self.__ground, literal.args)):
+                    literal = (self.__key(literal), tuple(map(self.__argument, literal.args)), not c.is_not())
+                    (statics if self.__static(c.arg(0) if c.is_not() else c) else literals).append(literal)
+            if dead:
+                continue
+            effects = []
+            for e in action.effects:
+                values = (e.value.bool_constant_value(),) if e.value.is_bool_constant() else (True, False)
+                effects.append((self.__key(e.fluent), tuple(map(self.__argument, e.fluent.args)), values))
+            schema = Schema(action.name, params, types, statics, literals, list(action.preconditions), effects)
+            for k, args, values in effects:
+                for v in values:
+                    self.achievers.setdefault((k, v), []).append((schema, args))
+
+    def __quantified(self, node, inside):
+        if node.is_fluent_exp():
+            if inside:
+                self.quantified.add(self.__key(node))
+            return
+        for a in node.args:
+            self.__quantified(a, inside or node.is_exists() or node.is_forall())
+
+    def __key(self, fluent_exp):
+        return self.env.rev_predicates[fluent_exp.fluent().name]
+
+    def __static(self, fluent_exp):
+        k = self.__key(fluent_exp)
+        return k in self.env.predicates_static and self.env.predicates_static[k] is None
+
+    @staticmethod
+    def __ground(arg):
+        return arg.is_parameter_exp() or arg.is_object_exp()
+
+    @staticmethod
+    def __argument(arg):
+        return (True, arg.parameter().name) if arg.is_parameter_exp() else (False, arg.object().name)
+
+    @staticmethod
+    def __resolve(argument, binding):
+        param, name = argument
+        return binding.get(name) if param else name
+
+    def objects(self, goals, values=None):
+        return self.prune(goals, values).objects
+
+    def prune(self, goals, values=None):
+        # the objects that can matter for the goals, and the goals without the ground literals that already hold
+        # and that no action over those objects can change: their atom may be unreachable in the pruned problem,
+        # which planners such as fast-downward reject for negative goals
+        with self.__lock:
+            self.values = self.state.values if values is None else values  # state the problem starts from
+            self.relevant = set()
+            self.needed = set()  # (atom, value)
+            self.expanded = set()
+            self.effects = {}  # atom => values set by relevant actions
+            self.patterns = {}  # predicate => [(arguments, value)] of universally quantified literals
+            self.work = []
+            seen = set()
+            for g in goals:
+                self.__walk(g, {}, {}, True)
+            goal = set(self.needed)
+            while len(self.work) > 0:
+                need = self.work.pop()
+                if need in self.expanded:
+                    continue
+                self.expanded.add(need)
+                (k, ids), value = need
+                candidates = []
+                for schema, args in self.achievers.get((k, value), ()):
+                    binding = {}
+                    if self.__unify(schema, args, ids, binding):
+                        candidates.extend((schema, b) for b in self.__bind(schema, binding,
+                                                                          [p for p in schema.params if p not in binding]))
+                # achievers over objects that are already relevant are preferred unless they undo a goal literal,
+                # as a heuristic this can make the pruned problem unsolvable so callers fall back to the full one
+                known = [(schema, b) for schema, b in candidates
+                         if self.relevant.issuperset(b.values()) and not self.__undoes(schema, b, goal)]
+                candidates = known if len(known) > 0 else candidates
+                for schema, b in candidates:
+                    key = (schema.name, tuple(b[p] for p in schema.params))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    self.relevant.update(b.values())
+                    for p in schema.preconditions:
+                        self.__walk(p, b, {}, True)
+                    for ek, eargs, values in schema.effects:
+                        for v in values:
+                            self.__effect((ek, tuple(self.__resolve(a, b) for a in eargs)), v)
+            return Pruned(self.relevant, [g for g in goals if not self.__settled(g)])
+
+    def __undoes(self, schema, binding, goal):
+        for k, args, values in schema.effects:
+            atom = (k, tuple(self.__resolve(a, binding) for a in args))
+            if len(values) == 1 and (atom, not values[0]) in goal:
+                return True
+        return False
+
+    def __settled(self, goal):
+        literal = goal.arg(0) if goal.is_not() else goal
+        if not literal.is_fluent_exp() or not all(a.is_object_exp() for a in literal.args):
+            return False
+        k = self.__key(literal)
+        if k not in self.state.layout:
+            return False
+        atom, value = (k, tuple(a.object().name for a in literal.args)), not goal.is_not()
+        if self.__get(atom) != value:
+            return False
+        # any instance over the relevant objects with an effect flipping the atom, only static preconditions checked
+        for schema, args in self.achievers.get((k, not value), ()):
+            binding = {}
+            if self.__unify(schema, args, atom[1], binding) and \
+                    any(self.relevant.issuperset(b.values())
+                        for b in self.__bind(schema, binding, [p for p in schema.params if p not in binding])):
+                return False
+        return True
+
+    def __unify(self, schema, args, ids, binding):
+        for (param, name), x in zip(args, ids):
+            if not param:
+                if name != x:
+                    return False
+            elif binding.setdefault(name, x) != x or x not in self.state.positions.get(schema.types[name], {}):
+                return False
+        return True
+
+    def __bind(self, schema, binding, free):
+        for k, args, value in schema.statics:
+            ids = tuple(self.__resolve(a, binding) for a in args)
+            if None not in ids and self.__get((k, ids)) != value:
+                return
+        if len(free) == 0:
+            # instances requiring an atom both true and false can never be applied
+            values = {}
+            for k, args, value in schema.literals:
+                if values.setdefault((k, tuple(self.__resolve(a, binding) for a in args)), value) != value:
+                    return
+            yield binding
+            return
+        for x in self.__candidates(schema, binding, free[0]):
+            yield from self.__bind(schema, binding | {free[0]: x}, free[1:])
+
+    def __candidates(self, schema, binding, param):
+        # a static precondition with param as its only unbound argument narrows it with a single slice
+        for k, args, value in schema.statics:
+            ids = [self.__resolve(a, binding) for a in args]
+            if (True, param) not in args or ids.count(None) != 1:
+                continue
+            _, offset, types, shape = self.state.layout[k]
+            index = []
+            for t, x in zip(types, ids):
+                if x is None:
+                    free = t
+                    index.append(slice(None))
+                elif x not in self.state.positions[t]:
+                    return []
+                else:
+                    index.append(self.state.positions[t][x])
+            values = self.values[offset:offset + int(np.prod(shape, dtype=np.int64))].reshape(shape)
+            allowed = self.state.positions.get(schema.types[param], {})
+            return [x for x in (self.state.hierarchy[free][i] for i in np.flatnonzero(values[tuple(index)] == value))
+                    if x in allowed]
+        return self.env.hierarchy.get(schema.types[param], ())
+
+    def __get(self, atom):
+        k, ids = atom
+        _, _, types, _ = self.state.layout[k]
+        if any(x not in self.state.positions[t] for t, x in zip(types, ids)):
+            return None
+        return bool(self.values[self.state.index(atom)])
+
+    def __need(self, atom, value):
+        if (atom, value) in self.needed:
+            return
+        self.needed.add((atom, value))
+        self.relevant.update(atom[1])
+        if self.__get(atom) != value or (not value) in self.effects.get(atom, ()):
+            self.work.append((atom, value))
+
+    def __effect(self, atom, value):
+        values = self.effects.setdefault(atom, set())
+        if value in values:
+            return
+        values.add(value)
+        if (atom, not value) in self.needed:
+            self.work.append((atom, not value))
+        for names, p in self.patterns.get(atom[0], ()):
+            if value != p and all(x is None or x == y for x, y in zip(names, atom[1])):
+                self.__need(atom, p)
+
+    def __walk(self, node, binding, variables, polarity):
+        # variables: variable => True when universally quantified, False when existential, None when unknown
+        if node.is_not():
+            self.__walk(node.arg(0), binding, variables, None if polarity is None else not polarity)
+        elif node.is_and() or node.is_or():
+            for a in node.args:
+                self.__walk(a, binding, variables, polarity)
+        elif node.is_implies():
+            self.__walk(node.arg(0), binding, variables, None if polarity is None else not polarity)
+            self.__walk(node.arg(1), binding, variables, polarity)
+        elif node.is_exists() or node.is_forall():
+            universal = None if polarity is None else node.is_forall() == polarity
+            self.__walk(node.arg(0), binding, variables | {v: universal for v in node.variables()}, polarity)
+        elif node.is_fluent_exp():
+            self.__literal(node, binding, variables, polarity)
+        else:
+            for a in node.args:
+                self.__walk(a, binding, variables, None)
+
+    def __literal(self, node, binding, variables, polarity):
+        k = self.__key(node)
+        if k not in self.state.layout:
+            return
+        _, offset, types, shape = self.state.layout[k]
+        names, index, free = [], [], []
+        for t, a in zip(types, node.args):
+            if a.is_variable_exp():
+                names.append(None)
+                index.append(slice(None))
+                free.append(variables.get(a.variable()))
+                continue
+            name = binding[a.parameter().name] if a.is_parameter_exp() else a.object().name
+            if name not in self.state.positions[t]:
+                return
+            names.append(name)
+            index.append(self.state.positions[t][name])
+        values = (True, False) if polarity is None else (polarity,)
+        if len(free) == 0:
+            for v in values:
+                self.__need((k, tuple(names)), v)
+            return
+
+        # universally quantified literals only need the atoms violating them now, or once a relevant action
+        # flips them; pruned objects keep their values as no action on the kept objects can touch them
+        atoms = self.values[offset:offset + int(np.prod(shape, dtype=np.int64))].reshape(shape)[tuple(index)]
+        universal = polarity is not None and set(free) == {True}
+        if universal:
+            self.patterns.setdefault(k, []).append((tuple(names), polarity))
+            atoms = atoms != polarity
+        else:
+            atoms = np.ones(atoms.shape, dtype=bool)
+        for position in np.argwhere(atoms):
+            position = iter(position)
+            atom = (k, tuple(self.state.hierarchy[t][int(next(position))] if x is None else x
+                             for t, x in zip(types, names)))
+            for v in values:
+                self.__need(atom, v)
+        if universal:
+            for atom, flips in list(self.effects.items()):
+                if atom[0] == k and (not polarity) in flips and \
+                        all(x is None or x == y for x, y in zip(names, atom[1])):
+                    self.__need(atom, polarity)
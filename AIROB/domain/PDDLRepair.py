@@ -0,0 +1,68 @@
+from collections import namedtuple, deque
+from itertools import product
+
+Repair = namedtuple("Repair", ["kind", "steps"])  # kind: reused, skipped or patched
+
+
+def skip(simulator, steps, values):
+    # applies the steps, dropping the inapplicable ones whose effects already hold
+    # returns the kept steps, the values reached and the index of the first step that could not be handled
+    values = values.copy()
+    kept = []
+    for i, (name, params) in enumerate(steps):
+        instance = simulator.instance(name, params)
+        if simulator.applicable(values, instance):
+            simulator.apply(values, instance)
+            kept.append((name, params))
+        elif instance is None or not simulator.achieved(values, instance):
+            return kept, values, i
+    return kept, values, None
+
+
+def candidates(env, simulator, objects, values):
+    # ground instances over the given objects whose static preconditions hold
+    ret = []
+    for action in simulator.actions.values():
+        domains = [[x for x in env.hierarchy.get(p.type.name, ()) if x in objects] for p in action.parameters]
+        for params in product(*domains):
+            instance = simulator.instance(action.name, params)
+            if instance is not None and simulator.feasible(values, instance):
+                ret.append((action.name, list(params), instance))
+    return ret
+
+
+def repair(env, steps, goals, depth=3, nodes=500):
+    with env.reading():
+        simulator = env.simulator()
+        values = env.state.values
+        if simulator.simulate(steps, values, goals).goal:
+            return Repair("reused", steps)
+        kept, reached, failed = skip(simulator, steps, values)
+        if failed is None and simulator.holds(goals, reached):
+            return Repair("skipped", kept)
+        if failed is None:
+            failed = len(steps)
+
+        # bounded breadth first search for a short patch after which the rest of the suffix reaches the goal
+        rest = steps[failed:]
+        objects = set(env.relevant_objects(goals)) | {x for _, params in steps for x in params}
+        actions = candidates(env, simulator, objects, reached)
+        queue = deque([(reached, [])])
+        visited = {reached.tobytes()}
+        while len(queue) > 0 and nodes > 0:
+            current, patch = queue.popleft()
+            nodes -= 1
+            tail, end, stuck = skip(simulator, rest, current)
+            if stuck is None and simulator.holds(goals, end):
+                return Repair("patched", kept + patch + tail)
+            if len(patch) >= depth:
+                continue
+            for name, params, instance in actions:
+                if not simulator.applicable(current, instance):
+                    continue
+                successor = simulator.apply(current.copy(), instance)
+                key = successor.tobytes()
+                if key not in visited:
+                    visited.add(key)
+                    queue.append((successor, patch + [(name, params)]))
+        return None
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from itertools import product
+
+import numpy as np
+
+from .PDDLRelevance import flatten
+
+Simulation = namedtuple("Simulation", ["values", "step", "goal"])  # step: first inapplicable step, None if all applied
+Instance = namedtuple("Instance", ["binding", "indices", "expected", "checks", "effects", "values", "conditional"])
+
+
+class PDDLSimulator:
+    # Applies plans to copies of the state store values using the compiled preconditions and effects,
+    # the domain objects are never touched. Ground literals of an action instance are resolved to state
+    # indices once and checked with a single lookup, the rest of the preconditions is interpreted.
+
+    def __init__(self, env, domain, size=4096):
+        self.env = env
+        self.state = env.state
+        self.actions = {a.name: a for a in domain.actions}
+        self.size = size
+        self.static = np.zeros(len(self.state), dtype=bool)  # atoms of the predicates no action changes
+        for k, value in env.predicates_static.items():
+            if value is None:
+                _, offset, _, shape = self.state.layout[k]
+                self.static[offset:offset + int(np.prod(shape, dtype=np.int64))] = True
+        self.instances = {}  # (action, params) => Instance, None when the parameters do not fit the action
+
+    def __name(self, arg, binding):
+        if arg.is_parameter_exp():
+            return binding[arg.parameter().name]
+        if arg.is_variable_exp():
+            return binding[arg.variable()]
+        return arg.object().name
+
+    def __index(self, node, binding):
+        _, offset, types, shape = self.state.layout[self.env.rev_predicates[node.fluent().name]]
+        index = 0
+        for t, n, a in zip(types, shape, node.args):
+            index = index * n + self.state.positions[t][self.__name(a, binding)]
+        return offset + index
+
+    def instance(self, name, params):
+        key = (name, tuple(params))
+        if key in self.instances:
+            return self.instances[key]
+        action = self.actions.get(name)
+        ret = None
+        if action is not None and len(action.parameters) == len(key[1]) and \
+                all(x in self.env.hierarchy.get(p.type.name, ()) for p, x in zip(action.parameters, key[1])):
+            ret = self.__compile(action, {p.name: x for p, x in zip(action.parameters, key[1])})
+        if len(self.instances) >= self.size:
+            self.instances.clear()
+        self.instances[key] = ret
+        return ret
+
+    def __compile(self, action, binding):
+        indices, expected, checks = [], [], []
+        for c in (c for p in action.preconditions for c in flatten(p)):
+            literal = c.arg(0) if c.is_not() else c
+            if literal.is_fluent_exp() and not any(a.is_variable_exp() for a in literal.args):
+                indices.append(self.__index(literal, binding))
+                expected.append(not c.is_not())
+            else:
+                checks.append(c)
+        effects, conditional = {}, []
+        for e in action.effects:
+            assert not e.is_forall(), f"{action.name}: universally quantified effects are not supported"
+            if e.is_conditional() or not e.value.is_bool_constant():
+                conditional.append(e)
+            elif e.value.bool_constant_value() or self.__index(e.fluent, binding) not in effects:
+                # add effects win over delete effects on the same atom
+                effects[self.__index(e.fluent, binding)] = e.value.bool_constant_value()
+        return Instance(binding, np.array(indices, dtype=np.int64), np.array(expected, dtype=bool), checks,
+                        np.array(list(effects.keys()), dtype=np.int64), np.array(list(effects.values()), dtype=bool),
+                        conditional)
+
+    def applicable(self, values, instance):
+        return instance is not None and bool(np.array_equal(values[instance.indices], instance.expected)) and \
+            all(self.evaluate(c, values, instance.binding) for c in instance.checks)
+
+    def feasible(self, values, instance):
+        # the static preconditions hold, so the instance can become applicable at some point
+        static = self.static[instance.indices]
+        return bool(np.array_equal(values[instance.indices[static]], instance.expected[static]))
+
+    def achieved(self, values, instance):
+        # applying the instance would not change anything
+        return len(instance.conditional) == 0 and bool(np.array_equal(values[instance.effects], instance.values))
+
+    def apply(self, values, instance):
+        # conditional effects are evaluated on the state before the action
+        conditional = [(self.__index(e.fluent, instance.binding), self.evaluate(e.value, values, instance.binding))
+                       for e in instance.conditional if self.evaluate(e.condition, values, instance.binding)]
+        values[instance.effects] = instance.values
+        for index, value in sorted(conditional, key=lambda x: x[1]):
+            values[index] = value
+        return values
+
+    def simulate(self, steps, values, goals=None):
+        values = values.copy()
+        for i, (name, params) in enumerate(steps):
+            instance = self.instance(name, params)
+            if not self.applicable(values, instance):
+                return Simulation(values, i, None)
+            self.apply(values, instance)
+        return Simulation(values, None, None if goals is None else self.holds(goals, values))
+
+    def holds(self, goals, values):
+        return all(self.evaluate(g, values, {}) for g in goals)
+
+    def evaluate(self, node, values, binding):
+        if node.is_fluent_exp():
+            return bool(values[self.__index(node, binding)])
+        if node.is_bool_constant():
+            return node.bool_constant_value()
+        if node.is_not():
+            return not self.evaluate(node.arg(0), values, binding)
+        if node.is_and():
+            return all(self.evaluate(a, values, binding) for a in node.args)
+        if node.is_or():
+            return any(self.evaluate(a, values, binding) for a in node.args)
+        if node.is_implies():
+            return not self.evaluate(node.arg(0), values, binding) or self.evaluate(node.arg(1), values, binding)
+        if node.is_iff():
+            return self.evaluate(node.arg(0), values, binding) == self.evaluate(node.arg(1), values, binding)
+        if node.is_equals():
+            return self.__name(node.arg(0), binding) == self.__name(node.arg(1), binding)
+        if node.is_exists() or node.is_forall():
+            variables = node.variables()
+            test = any if node.is_exists() else all
+            return test(self.evaluate(node.arg(0), values, binding | dict(zip(variables, objects)))
+                        for objects in product(*(self.env.hierarchy.get(v.type.name, ()) for v in variables)))
+        assert False, f"unsupported expression {node}"
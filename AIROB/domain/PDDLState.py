@@ -0,0 +1,152 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PDDLState:
+    def __init__(self, history=64):
+        self.history = history
+        self.version = 0
+        self.reset({}, {}, {})
+
+    def reset(self, predicates, hierarchy, indices):
+        # predicates: predicate => (name, parameter types), indices: object id => object index
+        self.layout = OrderedDict()  # predicate => (name, offset, parameter types, shape)
+        self.positions = {}  # type => {object id: position in the hierarchy}
+        self.hierarchy = {t: list(ids) for t, ids in hierarchy.items()}
+        self.indices = indices
+        self.rows = {t: np.array([indices[x] for x in ids], dtype=np.int64) for t, ids in self.hierarchy.items()}
+        offset = 0
+        for k, (name, types) in predicates.items():
+            shape = tuple(len(self.hierarchy.get(t, [])) for t in types)
+            self.layout[k] = (name, offset, tuple(types), shape)
+            offset += int(np.prod(shape, dtype=np.int64))
+        for t, ids in self.hierarchy.items():
+            self.positions[t] = {x: i for i, x in enumerate(ids)}
+        self.offsets = np.array([v[1] for v in self.layout.values()], dtype=np.int64)
+        self.predicates = list(self.layout.keys())
+        self.values = np.zeros(offset, dtype=bool)
+        self.dirty = set()  # atom indices
+        # the version keeps growing over resets, a version from before has no snapshot and cannot be diffed
+        self.snapshots = OrderedDict()  # version => packed values
+        self.committed = False  # whether the values of this layout have a version yet
+        self.__fingerprint = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def index(self, atom):
+        k, ids = atom
+        _, offset, types, shape = self.layout[k]
+        if len(shape) == 0:
+            return offset
+        return offset + int(np.ravel_multi_index(tuple(self.positions[t][x] for t, x in zip(types, ids)), shape))
+
+    def atom(self, index):
+        i = int(np.searchsorted(self.offsets, index, side='right')) - 1
+        k = self.predicates[i]
+        _, offset, types, shape = self.layout[k]
+        position = np.unravel_index(index - offset, shape) if len(shape) > 0 else ()
+        return k, tuple(self.hierarchy[t][int(p)] for t, p in zip(types, position))
+
+    def get(self, atom):
+        return bool(self.values[self.index(atom)])
+
+    def set(self, atom, value):
+        self.values[self.index(atom)] = value
+        self.__fingerprint = None
+
+    def mark_dirty(self, atom):
+        self.dirty.add(self.index(atom))
+
+    def update(self, evaluate):
+        delta = {}
+        for index in self.dirty:
+            atom = self.atom(index)
+            value = bool(evaluate(atom))
+            if self.values[index] != value:
+                self.values[index] = value
+                delta[atom] = value
+        self.dirty = set()
+        if len(delta) > 0 or not self.committed:
+            self.commit()
+        return delta
+
+    def assign(self, values):
+        # takes values computed elsewhere (the effects of an action) without evaluating anything, returns the
+        # changed atoms like update
+        delta = {}
+        for index in self.diff(self.values, values):
+            self.values[index] = values[index]
+            delta[self.atom(int(index))] = bool(values[index])
+        if len(delta) > 0:
+            self.commit()
+        return delta
+
+    def commit(self):
+        self.version += 1
+        self.committed = True
+        self.__fingerprint = None
+        self.snapshots[self.version] = self.pack()
+        while len(self.snapshots) > self.history:
+            self.snapshots.popitem(last=False)
+
+    def snapshot(self):
+        return self.values.copy()
+
+    def pack(self, values=None):
+        return np.packbits(self.values if values is None else values)
+
+    def unpack(self, packed):
+        return np.unpackbits(packed, count=len(self.values)).astype(bool)
+
+    @staticmethod
+    def diff(a, b):
+        return np.flatnonzero(a ^ b)
+
+    def changes(self, since):
+        if since not in self.snapshots:
+            return None
+        return self.diff(self.unpack(self.snapshots[since]), self.values)
+
+    def fingerprint(self):
+        if self.__fingerprint is None:
+            self.__fingerprint = hashlib.blake2b(self.pack().tobytes(), digest_size=16).hexdigest()
+        return self.__fingerprint
+
+    def mask(self, ids):
+        # atoms whose parameters are all in ids
+        ret = np.zeros(len(self.values), dtype=bool)
+        selected = np.array([self.indices[x] for x in ids if x in self.indices], dtype=np.int64)
+        keep = {t: np.isin(rows, selected) for t, rows in self.rows.items()}
+        for _, offset, types, shape in self.layout.values():
+            m = np.ones(shape, dtype=bool)
+            for i, t in enumerate(types):
+                m &= keep.get(t, np.zeros(0, dtype=bool)).reshape([-1 if j == i else 1 for j in range(len(shape))])
+            ret[offset:offset + m.size] = m.ravel()
+        return ret
+
+    def atoms(self, indices, values=None):
+        values = self.values if values is None else values
+        ret = {}
+        for index in indices:
+            k, ids = self.atom(int(index))
+            ret.setdefault(self.layout[k][0], []).append([list(ids), bool(values[index])])
+        return ret
+
+    def to_dict(self):
+        ret = {}
+        for index in np.flatnonzero(self.values):
+            k, ids = self.atom(int(index))
+            ret.setdefault(self.layout[k][0], []).append(list(ids))
+        return {"version": self.version, "state": ret}
+
+    def layout_dict(self):
+        return {
+            "version": self.version,
+            "size": len(self.values),
+            "predicates": [{"name": name, "offset": offset, "params": list(types), "shape": list(shape)}
+                           for name, offset, types, shape in self.layout.values()],
+            "objects": self.hierarchy,
+        }
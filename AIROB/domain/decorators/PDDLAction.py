@@ -2,18 +2,18 @@ from AIROB.domain import PDDLEnvironment
 
 
 class __PDDLAction:
-    def __init__(self, func, user):
+    def __init__(self, func, user, exact):
         self.func = func
         self.env = PDDLEnvironment.get_instance()
-        self.env.add_action(func, user)
+        self.env.add_action(func, user, exact)
 
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
 
-def PDDLAction(user=False):
+def PDDLAction(user=False, exact=False):
     def wrap(func):
-        return __PDDLAction(func, user)
+        return __PDDLAction(func, user, exact)
     return wrap
 
 
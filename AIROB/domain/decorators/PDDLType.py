@@ -5,4 +5,5 @@ def PDDLType(cls):
     assert PDDLObject in cls.__mro__
     inst = PDDLEnvironment.get_instance()
     inst.set_type(cls)
+    inst.compile_type_metadata(cls)
     return cls
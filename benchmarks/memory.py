@@ -0,0 +1,88 @@
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "AIROB"))
+
+import argparse
+import gc
+import json
+import subprocess
+import tracemalloc
+
+
+def traced(phases, name, func, *args, **kwargs):
+    # bytes still allocated after the phase and peak bytes during it
+    gc.collect()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    ret = func(*args, **kwargs)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    phases[name] = {"retained": current - before, "peak": peak - before}
+    return ret
+
+
+def predicates(env, objects, rounds):
+    # what expression building does: look up predicate callables on the wrappers
+    for _ in range(rounds):
+        for obj in objects:
+            for name in env.type_metadata(obj.instance.__class__).predicates:
+                getattr(obj, name)
+
+
+def run(args):
+    # runs a single size in this process, domain registration happens at import time
+    from unified_planning.environment import get_environment
+    from AIROB.domain import PDDLEnvironment
+    get_environment().credits_stream = None
+
+    domain = __import__(args.domain)
+    domain_args, _ = domain.args().parse_known_args(args=[f"--cubes={args.worker}"])
+    env = PDDLEnvironment.get_instance()
+
+    tracemalloc.start()
+    phases = {}
+    traced(phases, "create_env", domain.create_env, env, domain_args)
+    traced(phases, "domain", env.domain)
+    traced(phases, "state", env.update_state)
+    traced(phases, "predicates", predicates, env, list(env.objects.values()), args.rounds)
+    tracemalloc.stop()
+    count = len(env.objects)
+    for phase in list(phases.values()):
+        phase["per_object"] = phase["retained"] / count
+    phases["objects"] = count
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='memory', description='Measures the bytes allocated per registered object')
+    parser.add_argument('-d', '--domain', type=str, default='cubeotta', help='Domain package')
+    parser.add_argument('--sizes', type=str, default='16,64,256,1024', help='Comma separated cube counts')
+    parser.add_argument('--rounds', type=int, default=10, help='Predicate lookups per object and predicate')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Write the results JSON to this file')
+    parser.add_argument('--worker', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run(args)))
+        return 0
+
+    results = {"domain": args.domain, "rounds": args.rounds, "sizes": {}}
+    for size in map(int, args.sizes.split(',')):
+        out = subprocess.run([sys.executable, __file__, "--worker", str(size), "--domain", args.domain,
+                              "--rounds", str(args.rounds)], capture_output=True, text=True, check=True)
+        results["sizes"][str(size)] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{size}: {json.dumps(results['sizes'][str(size)])}", file=sys.stderr)
+
+    out = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(out)
+    print(out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "AIROB"))
+
+import argparse
+import json
+import subprocess
+import time
+
+
+def timed(phases, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    ret = func(*args, **kwargs)
+    phases[name] = time.perf_counter() - start
+    return ret
+
+
+def run(args):
+    # runs a single size in this process, domain registration happens at import time
+    from unified_planning.environment import get_environment
+    from AIROB.domain import PDDLEnvironment
+    get_environment().credits_stream = None
+
+    phases = {}
+    domain = timed(phases, "registration", __import__, args.domain)
+    domain_args, _ = domain.args().parse_known_args(args=[f"--cubes={args.worker}"])
+    env = timed(phases, "create_env", domain.create_env, PDDLEnvironment.get_instance(), domain_args)
+    timed(phases, "domain", env.domain)
+    timed(phases, "state", env.update_state)
+
+    goals = []
+    for i in range(min(args.goals, args.worker)):
+        goals.append(env.get_object_by_id(f"Cube_{i}_side_{i % 6}").painted())
+    # the first rendering also writes the domain file, later ones only emit the problem
+    timed(phases, "render", env.pddl, goals)
+    domain_file, problem, writer = timed(phases, "problem", env.pddl, goals)
+    if args.prune:
+        relevant = timed(phases, "relevance", env.relevant_objects, goals)
+        _, problem, _ = env.pddl(goals, objects=relevant)
+        phases["objects"] = len(relevant)
+
+    if args.worker > args.plan_limit:
+        return phases
+    from AIROB.domain.PDDLJobs import solve
+    try:
+        get_environment().factory.engine(args.planner)
+    except KeyError:
+        print(f"skipping planning: {args.planner} is not installed", file=sys.stderr)
+        return phases
+    planners = {}
+    status, plan = timed(phases, "solve", solve, planners, args.planner, domain_file, problem)
+    for planner in planners.values():
+        planner.destroy()
+    if status == "solved":
+        # the planner output uses the names of the PDDL text, like the server
+        steps = [(writer.get_item_named(name).name, [writer.get_item_named(p).name for p in params])
+                 for name, params in plan]
+        timed(phases, "serialize", env.serialize_steps, steps)
+        phases["plan_length"] = len(plan)
+    return phases
+
+
+def measure(args, size):
+    best = {}
+    for _ in range(args.repeat):
+        out = subprocess.run([sys.executable, __file__, "--worker", str(size), "--domain", args.domain,
+                              "--goals", str(args.goals), "--planner", args.planner,
+                              "--plan-limit", str(args.plan_limit)] + (["--prune"] if args.prune else []),
+                             stdout=subprocess.PIPE, text=True, check=True)
+        phases = json.loads(out.stdout.strip().splitlines()[-1])
+        for k, v in phases.items():
+            best[k] = min(best.get(k, v), v)
+    return best
+
+
+def compare(results, baseline, threshold, min_delta):
+    regressions = []
+    for size, phases in results["sizes"].items():
+        for phase, value in phases.items():
+            old = baseline.get("sizes", {}).get(size, {}).get(phase)
+            if old is None or phase in ("plan_length", "objects") or old <= 0:
+                continue
+            if value / old > threshold and value - old > min_delta:
+                regressions.append({"size": size, "phase": phase, "baseline": old, "current": value,
+                                    "ratio": value / old})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='scaling', description='Times the phases of the planning pipeline')
+    parser.add_argument('-d', '--domain', type=str, default='cubeotta', help='Domain package')
+    parser.add_argument('--sizes', type=str, default='1,2,4,8,16,32,64,128,256', help='Comma separated cube counts')
+    parser.add_argument('--goals', type=int, default=1, help='Number of synthetic painting goals')
+    parser.add_argument('--planner', type=str, default='fast-downward', help='Planning engine name')
+    parser.add_argument('--plan-limit', type=int, default=64, help='Largest size that is also solved')
+    parser.add_argument('--prune', action='store_true', help='Solve the problem pruned to the goal relevant objects')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size, the fastest one is kept')
+    parser.add_argument('--baseline', type=str, default=None, help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Slowdown ratio reported as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='Seconds under which slowdowns are noise')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Write the results JSON to this file')
+    parser.add_argument('--worker', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run(args)))
+        return 0
+
+    results = {"domain": args.domain, "goals": args.goals, "planner": args.planner, "prune": args.prune, "sizes": {}}
+    for size in map(int, args.sizes.split(',')):
+        results["sizes"][str(size)] = measure(args, size)
+        print(f"{size}: {json.dumps(results['sizes'][str(size)])}", file=sys.stderr)
+
+    ret = 0
+    if args.baseline is not None and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+    elif args.baseline is not None and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            results["regressions"] = compare(results, json.load(f), args.threshold, args.min_delta)
+        ret = 1 if len(results["regressions"]) > 0 else 0
+
+    out = json.dumps(results, indent=2)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(out)
+    print(out)
+    return ret
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -171,6 +171,44 @@ function get_next_waypoint(steps: any, selected: string){
     return current
 }
 
+const NDJSON = "application/x-ndjson"
+
+async function read_job(res: Response, on_step: (step: any) => void): Promise<any> {
+    // finished plans come as NDJSON, the job without its plan and then one step per line,
+    // so that the first steps are shown before the whole plan is received
+    if (!(res.headers.get("Content-Type") ?? "").startsWith(NDJSON) || !res.body) {
+        const job = await res.json()
+        if (!res.ok) throw job
+        job.plan?.forEach(on_step)
+        return job
+    }
+    const reader = res.body.getReader()
+    const decoder = new TextDecoder()
+    let job: any = undefined
+    let buffer = ""
+    for (;;) {
+        const {done, value} = await reader.read()
+        buffer += decoder.decode(value, {stream: !done})
+        const lines = buffer.split("\n")
+        buffer = done ? "" : lines.pop() ?? ""
+        for (const line of lines.filter(l => l.trim() != "")) {
+            if (job === undefined)
+                job = JSON.parse(line)
+            else
+                on_step(JSON.parse(line))
+        }
+        if (done) return job
+    }
+}
+
+async function wait_plan(res: Response, on_step: (step: any) => void) {
+    let job = await read_job(res, on_step)
+    while (job.status == "queued" || job.status == "running") {
+        await new Promise(resolve => setTimeout(resolve, 250))
+        job = await fetch(`/api/plan/${job.id}`, {headers: {Accept: NDJSON}}).then(res => read_job(res, on_step))
+    }
+}
+
 async function execute_internal(action: PDDLGraphAction) {
     if (action.user)
         alert(action.user_message)
@@ -273,34 +311,37 @@ export const NodeContextProvider = (props: { children: React.ReactElement | Reac
 
         console.log(next_steps[child || ""], next_steps[id])
 
+        // each step is added after the previous one as soon as it is received
+        let current: any = next_steps
+        let last = id
+        let first = ""
+        const on_step = (e: any) => {
+            [current, last] = add_new_internal(current, last, {
+                type: NodeType.ACTION,
+                predicates: [],
+                selected: false,
+                label: `${e.user ? "USER: " : ""}${e.params[0]}.${e.action}(${e.params.slice(1).join(", ")})`,
+                user: e.user,
+                user_message: e.user_message || "",
+                name: e.action,
+                params: e.params
+            } as PDDLGraphAction)
+            first = first || last
+            setSteps(current)
+        }
+
         fetch("/api/plan", {
             method: 'POST',
-            headers: {'Content-Type': "application/json"},
+            headers: {'Content-Type': "application/json", 'Accept': NDJSON},
             body: JSON.stringify(next_steps[child || ""]?.predicates || [])
         })
-            .then(res => res.json())
-            .then(data => {
-                return data.reverse().reduce((a: string, e: any) => {
-                    console.log(a)
-                    return add_new_internal(a[0], id, {
-                        type: NodeType.ACTION,
-                        predicates: [],
-                        selected: false,
-                        label: `${e.user ? "USER: " : ""}${e.params[0]}.${e.action}(${e.params.slice(1).join(", ")})`,
-                        user: e.user,
-                        user_message: e.user_message || "",
-                        name: e.action,
-                        params: e.params
-                    } as PDDLGraphAction)
-                }, [next_steps, ""])
-            })
-            .then(([steps, id]) => {
-                if (id) {
-                    steps[selected].selected = false
-                    steps[id].selected = true
-                    setSelected(id)
+            .then(res => wait_plan(res, on_step))
+            .then(() => {
+                if (first) {
+                    current = {...current, [selected]: {...current[selected], selected: false}, [first]: {...current[first], selected: true}}
+                    setSelected(first)
                 }
-                setSteps(steps)
+                setSteps(current)
             }).catch(() => {
         })
     }, [steps, selected])
@@ -0,0 +1,49 @@
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "AIROB"))
+
+import pytest
+from unified_planning.environment import get_environment
+
+from AIROB.domain import PDDLEnvironment
+from AIROB.domain.PDDLJobs import PDDLJobManager
+
+get_environment().credits_stream = None
+
+
+def attributes(env):
+    # the attributes of the domain objects, without the ones PDDLObject keeps for the environment
+    return {x: {k: v for k, v in vars(o.instance).items() if not k.startswith("_PDDLObject__")}
+            for x, o in env.objects.items()}
+
+
+@pytest.fixture(scope="session")
+def session():
+    # the environment is a process wide singleton, every test module shares the same Cubeotta objects
+    domain = __import__("cubeotta")
+    env = PDDLEnvironment.get_instance()
+    if len(env.objects) == 0:
+        domain.create_env(env, domain.args().parse_args(["--cubes", "2"]))
+    env.domain()
+    manager = PDDLJobManager.init(["fast-downward"], 2)
+    yield env, attributes(env)
+    manager.close()
+
+
+@pytest.fixture(scope="session")
+def env(session):
+    return session[0]
+
+
+@pytest.fixture
+def initial_env(session):
+    # the shared environment put back in its initial state, for tests that do not hold in any state
+    env, initial = session
+    for x, values in initial.items():
+        for k, v in values.items():
+            setattr(env.objects[x].instance, k, v)
+    env.update_state()
+    return env
@@ -0,0 +1,40 @@
+import importlib
+import json
+
+import pytest
+
+FALSE_GOAL = [{"object": "Color_red", "predicate": "empty", "params": {}, "value": True}]
+
+
+@pytest.fixture(scope="module")
+def client(env):
+    return importlib.import_module("AIROB.__main__").app.test_client()
+
+
+def test_goal_on_inlined_predicate_is_unsolvable(env, client):
+    # Color.empty is static and false, the goal simplifies to false and no problem can be rendered
+    assert {f.__qualname__: v for f, v in env.predicates_static.items()}["Color.empty"] is False
+    response = client.post("/api/plan", data=json.dumps(FALSE_GOAL))
+    assert response.status_code == 200
+    assert response.json["status"] == "unsolvable"
+    assert response.json["plan"] == []
+    response = client.post("/api/simulate", data=json.dumps({"plan": [], "goal": FALSE_GOAL}))
+    assert response.status_code == 200
+    assert response.json["goal"] is False
+
+
+@pytest.mark.parametrize("body", ["not json", "5", "{}", '["Brush_0"]', '["Cube_0", "Cube_1"]'])
+def test_execute_rejects_invalid_parameters(client, body):
+    assert client.post("/api/execute/Cube_load", data=body).status_code == 400
+
+
+def test_state_diff_across_recompilation(env, client):
+    # the state is rebuilt with the domain, a version from before the rebuild cannot be diffed any more
+    before = client.get("/api/state").json["version"]
+    env.invalidate_domain()
+    response = client.get(f"/api/state/diff?since={before}")
+    assert response.status_code == 410
+    assert response.json["version"] == before + 1
+    response = client.get(f"/api/state/diff?since={before + 1}")
+    assert response.status_code == 200
+    assert response.json["changes"] == {}
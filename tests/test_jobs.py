@@ -0,0 +1,35 @@
+import os
+import signal
+
+import pytest
+
+from AIROB.domain.PDDLJobs import PDDLJobManager
+
+TIMEOUT = 60
+
+
+@pytest.fixture
+def manager():
+    manager = PDDLJobManager(["fast-downward"], 1)
+    yield manager
+    manager.close()
+
+
+def problem(env):
+    domain, problem, _ = env.pddl([env.get_object_by_id("Cube_0").loaded()])
+    return domain, problem
+
+
+def test_dead_worker_fails_its_job_and_is_replaced(env, manager):
+    job = manager.submit(*problem(env))
+    assert job.wait(TIMEOUT) and job.status == "solved"
+    # the idle worker dies, the next run is sent to a closed pipe
+    process = manager.workers[0][0]
+    os.kill(process.pid, signal.SIGKILL)
+    process.join()
+    job = manager.submit(*problem(env))
+    assert job.wait(TIMEOUT)
+    assert job.status == "failed" and "died" in job.error
+    # the dispatcher is still running, with a new worker
+    job = manager.submit(*problem(env))
+    assert job.wait(TIMEOUT) and job.status == "solved"
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from AIROB.domain.PDDLLock import PDDLLock
+
+TIMEOUT = 5
+
+
+def start(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_reentrant():
+    lock = PDDLLock()
+    with lock.read():
+        with lock.read():
+            assert lock.reading()
+        assert lock.reading()
+    assert not lock.reading()
+    with lock.write():
+        with lock.write():
+            # the writer may also read
+            with lock.read():
+                assert lock.reading()
+    # everything was released, another thread can write
+    done = threading.Event()
+    start(lambda: (lock.acquire_write(), lock.release_write(), done.set()))
+    assert done.wait(TIMEOUT)
+
+
+def test_read_cannot_be_upgraded():
+    lock = PDDLLock()
+    with lock.read():
+        with pytest.raises(AssertionError):
+            lock.acquire_write()
+    with lock.write():
+        pass
+
+
+def test_readers_share_the_lock():
+    lock = PDDLLock()
+    inside = threading.Barrier(2, timeout=TIMEOUT)
+
+    def read():
+        with lock.read():
+            inside.wait()
+
+    threads = [start(read) for _ in range(2)]
+    for t in threads:
+        t.join(TIMEOUT)
+        assert not t.is_alive()
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = PDDLLock()
+    order = []
+    lock.acquire_read()
+    writer = start(lambda: (lock.acquire_write(), order.append("write"), lock.release_write()))
+    while lock._PDDLLock__waiting == 0:
+        time.sleep(0.01)
+    reader = start(lambda: (lock.acquire_read(), order.append("read"), lock.release_read()))
+    time.sleep(0.1)
+    # neither the writer nor the reader arriving after it got in while the first reader holds the lock
+    assert order == []
+    lock.release_read()
+    writer.join(TIMEOUT)
+    reader.join(TIMEOUT)
+    assert order == ["write", "read"]
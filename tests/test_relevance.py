@@ -0,0 +1,97 @@
+import contextlib
+import io
+import random
+
+import pytest
+from unified_planning.shortcuts import Not
+
+from AIROB.domain.PDDLJobs import PDDLJobManager
+from AIROB.domain.PDDLRepair import candidates
+
+STATES = 24
+WALK = 6
+TIMEOUT = 120
+
+
+def applicable(env, values):
+    simulator = env.simulator()
+    return [(name, params, instance) for name, params, instance in
+            candidates(env, simulator, set(env.objects), values) if simulator.applicable(values, instance)]
+
+
+def walk(env, rng, steps):
+    # executes random applicable actions, so that the state stays reachable
+    for _ in range(steps):
+        steps = applicable(env, env.state.values)
+        if len(steps) == 0:
+            return
+        name, params, _ = rng.choice(steps)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert env.execute_action_raw(name, params, guard=True)
+
+
+def random_goals(env, rng, count, steps):
+    # atoms of a state reached by simulating a further random walk, so that the goal is solvable
+    values = env.state.values.copy()
+    for _ in range(steps):
+        instances = applicable(env, values)
+        if len(instances) == 0:
+            break
+        env.simulator().apply(values, rng.choice(instances)[2])
+    changed = [i for i in env.state.diff(env.state.values, values)]
+    atoms = [i for i in range(len(env.state)) if env.state.atom(i)[0] not in env.predicates_static]
+    goals = []
+    for i in rng.sample(changed, min(count, len(changed))) + rng.sample(atoms, 1):
+        k, ids = env.state.atom(int(i))
+        goal = env.predicates_compiled[k](*map(env.get_object_by_id, ids))
+        goals.append(goal if values[i] else Not(goal))
+    return goals
+
+
+def solve(env, goals, objects=None, fallback=None):
+    domain, problem, writer = env.pddl(goals, objects=objects)
+    job = PDDLJobManager.get_instance().submit(domain, problem, fallback=fallback)
+    assert job.wait(TIMEOUT)
+    steps = None
+    if job.status == "solved":
+        steps = [(writer.get_item_named(name).name, [writer.get_item_named(p).name for p in params])
+                 for name, params in job.plan]
+    return job.status, steps, problem, job.error
+
+
+def test_settled_goal_is_dropped_and_failures_fall_back(initial_env):
+    # from the initial state: Cube_0_side_1 is down and no kept action can rotate it
+    env = initial_env
+    goals = [Not(env.get_object_by_id("Cube_0_side_1").up()), Not(env.get_object_by_id("Cube_1_side_0").up())]
+    pruned = env.prune(goals)
+    assert [str(g) for g in pruned.goals] == [str(goals[1])]
+    _, _, problem, _ = solve(env, goals)
+    status, steps, _, _ = solve(env, pruned.goals, pruned.objects, fallback=problem)
+    assert status == "solved"
+    assert [name for name, _ in steps] == ["Cube_rotate"]
+    assert env.simulate(steps, goals).goal
+
+
+@pytest.mark.parametrize("seed", range(STATES))
+def test_pruned_problem_agrees_with_full_problem(env, seed):
+    rng = random.Random(seed)
+    walk(env, rng, WALK)
+    goals = random_goals(env, rng, rng.randint(1, 2), WALK)
+    full, _, problem, error = solve(env, goals)
+    pruned = env.prune(goals)
+    status, steps, _, _ = solve(env, pruned.goals, pruned.objects)
+
+    if full == "failed":
+        # fast-downward rejects some negative goals (multi-valued variables), there is nothing to compare
+        pytest.skip(f"planner failure on the full problem: {error}")
+    # the goal holds in a reachable state
+    assert full == "solved"
+    # soundness: a pruned plan reaches the whole goal from the current state
+    if status == "solved":
+        assert env.simulate(steps, goals).goal
+    # completeness: pruning never turns a solvable goal into an unsolvable one, planner failures on the
+    # pruned problem are covered by the fallback to the full one
+    assert status != "unsolvable", (goals, sorted(pruned.objects), pruned.goals)
+    status, steps, _, _ = solve(env, pruned.goals, pruned.objects, fallback=problem)
+    assert status == "solved"
+    assert env.simulate(steps, goals).goal
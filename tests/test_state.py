@@ -0,0 +1,127 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+from AIROB.domain.PDDLRepair import candidates
+from AIROB.domain.PDDLState import PDDLState
+
+PREDICATES = {"free": ("free", []), "on": ("on", ["A"]), "near": ("near", ["A", "B"])}
+HIERARCHY = {"A": ["a0", "a1"], "B": ["b0", "b1", "b2"]}
+INDICES = {"a0": 0, "a1": 1, "b0": 2, "b1": 3, "b2": 4}
+STEPS = 12
+
+
+@pytest.fixture
+def state():
+    state = PDDLState(history=4)
+    state.reset(PREDICATES, HIERARCHY, INDICES)
+    return state
+
+
+def test_index_atom_round_trip(state):
+    assert len(state) == 1 + 2 + 2 * 3
+    atoms = [state.atom(i) for i in range(len(state))]
+    assert len(set(atoms)) == len(state)
+    assert all(state.index(atom) == i for i, atom in enumerate(atoms))
+    assert state.atom(state.index(("near", ("a1", "b2")))) == ("near", ("a1", "b2"))
+
+
+def test_update_commits_changes(state):
+    true = {("on", ("a1",)), ("near", ("a0", "b1"))}
+    state.dirty.update(range(len(state)))
+    assert state.update(lambda atom: atom in true) == {atom: True for atom in true}
+    assert state.version == 1
+    # nothing changed, no new version
+    state.mark_dirty(("on", ("a1",)))
+    assert state.update(lambda atom: atom in true) == {}
+    assert state.version == 1
+    state.mark_dirty(("on", ("a1",)))
+    state.mark_dirty(("free", ()))
+    assert state.update(lambda atom: atom[0] != "on") == {("on", ("a1",)): False, ("free", ()): True}
+    assert state.version == 2
+    changes = state.changes(1)
+    assert sorted(changes.tolist()) == sorted([state.index(("on", ("a1",))), state.index(("free", ()))])
+    assert state.atoms(changes) == {"free": [[[], True]], "on": [[["a1"], False]]}
+    assert len(state.changes(2)) == 0
+    assert state.changes(3) is None
+
+
+def test_assign_and_history(state):
+    values = state.snapshot()
+    for i in range(6):
+        values[i] = True
+        assert state.assign(values) == {state.atom(i): True}
+    assert state.assign(values) == {}
+    assert state.version == 6
+    # only the last 4 versions can be diffed
+    assert state.changes(2) is None
+    assert PDDLState.diff(state.unpack(state.snapshots[3]), state.values).tolist() == [3, 4, 5]
+    assert (state.unpack(state.pack()) == state.values).all()
+
+
+def test_reset_keeps_the_version(state):
+    state.assign(np.ones(len(state), dtype=bool))
+    version = state.version
+    state.reset(PREDICATES, HIERARCHY, INDICES)
+    assert state.changes(version) is None
+    state.update(lambda atom: False)
+    assert state.version == version + 1
+    assert len(state.changes(version + 1)) == 0
+
+
+def test_mask(state):
+    mask = state.mask({"a0", "b1"})
+    kept = {state.atom(i) for i in np.flatnonzero(mask)}
+    assert kept == {("free", ()), ("on", ("a0",)), ("near", ("a0", "b1"))}
+
+
+def test_domain_layout_round_trip(env):
+    with env.reading():
+        assert all(env.state.index(env.state.atom(i)) == i for i in range(len(env.state)))
+
+
+def test_reading_waits_for_an_up_to_date_state(env):
+    env.state.dirty.update(range(len(env.state)))
+    with env.reading():
+        assert len(env.state.dirty) == 0
+        with env.reading():
+            pass
+    env.invalidate_domain()
+    with env.reading():
+        assert len(env.state.dirty) == 0
+        assert env.state.committed
+
+
+def test_exact_actions_match_the_evaluated_state(env):
+    # exact actions take their effects from the simulator, evaluating every atom again must not change anything
+    rng = random.Random(7)
+    for _ in range(STEPS):
+        simulator = env.simulator()
+        values = env.state.snapshot()
+        steps = [(name, params) for name, params, instance in candidates(env, simulator, set(env.objects), values)
+                 if env.executors[name].exact and simulator.applicable(values, instance)]
+        if len(steps) == 0:
+            break
+        step = rng.choice(steps)
+        simulated = env.simulate([step]).values
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert env.execute_action_raw(*step, guard=True)
+        assert (env.state.values == simulated).all()
+        with env.lock.write():
+            env.state.dirty.update(range(len(env.state)))
+            assert env.update_state() == {}
+
+
+@pytest.mark.parametrize("goal, error", [
+    ({"object": "Cube_0"}, "missing fields"),
+    ({"object": "Nope", "predicate": "loaded", "params": {}, "value": True}, "unknown object"),
+    ({"object": "Cube_0", "predicate": "nope", "params": {}, "value": True}, "unknown predicate"),
+    ({"object": "Cube_0", "predicate": "loaded", "params": {"x": "Cube_1"}, "value": True}, "wrong parameters"),
+    ({"object": "Cube_0", "predicate": "loaded", "params": {}, "value": "yes"}, "value is not a boolean"),
+])
+def test_invalid_goals(env, goal, error):
+    assert env.goals.validate(goal)["error"] == error
+    assert env.goals.validate({"object": "Cube_0", "predicate": "loaded", "params": {}, "value": True}) is None